@@ -0,0 +1,12 @@
+#!/usr/bin/env python3
+"""
+Shared column-name cleaning for the electricity processing scripts
+Normalizes headers to the UPPER_SNAKE_CASE names used by the Snowflake tables
+"""
+
+# Spaces become underscores and brackets are dropped in a single translate pass
+_COLUMN_NAME_TABLE = str.maketrans({' ': '_', '(': None, ')': None})
+
+def clean_column_names(columns) -> list:
+    """Strip, underscore and upper-case column labels, e.g. 'Load (MW)' -> 'LOAD_MW'"""
+    return [str(col).strip().translate(_COLUMN_NAME_TABLE).upper() for col in columns]
@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+"""
+Shared CSV writer for the processing scripts
+Writes the Snowflake load files as UTF-8 without the index, through one large buffered handle
+"""
+
+# Hand the OS 1 MiB blocks rather than the default 8 KiB
+OUTPUT_BUFFER_SIZE = 1 << 20
+
+def write_csv(df, path, **kwargs) -> None:
+    """Write df to path for COPY INTO; extra keyword arguments go to DataFrame.to_csv"""
+    with open(path, 'w', buffering=OUTPUT_BUFFER_SIZE, encoding='utf-8', newline='') as f:
+        df.to_csv(f, index=False, **kwargs)
@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+"""
+Shared Excel engine choice and sheet loader for the electricity processing scripts
+"""
+
+import pandas as pd
+
+# Prefer the Rust-backed calamine reader when installed; openpyxl is the pinned fallback
+try:
+    import python_calamine  # noqa: F401
+    EXCEL_ENGINE = 'calamine'
+except ImportError:
+    EXCEL_ENGINE = 'openpyxl'
+
+def load_sheet(path, sheet_name: str, skiprows: int = None, nrows: int = None) -> pd.DataFrame:
+    """Load one sheet region without headers using the shared engine"""
+    return pd.read_excel(path, sheet_name=sheet_name, header=None, skiprows=skiprows, nrows=nrows,
+                         engine=EXCEL_ENGINE)
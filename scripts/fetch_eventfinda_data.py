@@ -7,11 +7,13 @@ Data Source: https://www.eventfinda.co.nz/feed/events/new-zealand/whatson/upcomi
 Theme: HIWA_I_TE_RANGI (Travel & Tourism)
 """
 
+import io
 import requests
 import xml.etree.ElementTree as ET
 import pandas as pd
 import re
 from datetime import datetime, timedelta
+from typing import BinaryIO, Iterator, Union
 from urllib.parse import parse_qs, urlparse
 import logging
 
@@ -19,19 +21,91 @@ import logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def fetch_eventfinda_rss(rss_url: str) -> str:
-    """Fetch RSS feed content from EventFinda"""
+EVENTFINDA_RSS_URL = "https://www.eventfinda.co.nz/feed/events/new-zealand/whatson/upcoming.rss"
+
+# Patterns used on every RSS item, compiled once at import
+_TAG_RE = re.compile(r'<[^>]+>')
+_ENTITY_RE = re.compile(r'&[a-zA-Z]+;')
+_WHITESPACE_RE = re.compile(r'\s+')
+_LOCATION_DATE_RE = re.compile(r'([^|]+)\|\s*([^|]+)$')  # "Location | Date"
+_HAS_YEAR_RE = re.compile(r'\d{4}')  # every parseable date needs a 4-digit year
+_DATE_RE = re.compile(r'(?:\w+day,\s*)?(\d{1,2})\s+(\w+)\s+(\d{4})')  # "[Sunday, ]3 August 2025"
+_EVENT_ID_RE = re.compile(r'(\d+)')
+
+# Event categories based on EventFinda data patterns, in match priority order
+EVENT_CATEGORIES = {
+    'Music & Performance': ['jazz', 'concert', 'music', 'performance', 'orchestra', 'band', 'singing'],
+    'Arts & Culture': ['art', 'craft', 'exhibition', 'gallery', 'culture', 'museum', 'drawing', 'painting'],
+    'Sports & Recreation': ['sport', 'volleyball', 'skateboard', 'training', 'fitness', 'gym', 'recreation'],
+    'Comedy & Entertainment': ['comedy', 'comedian', 'laugh', 'entertainment', 'magic', 'illusionist'],
+    'Food & Dining': ['food', 'dining', 'restaurant', 'cuisine', 'chef', 'cooking', 'market'],
+    'Education & Workshops': ['workshop', 'class', 'learn', 'training', 'education', 'course', 'tutorial'],
+    'Family & Children': ['children', 'kids', 'family', 'youth', 'teens', 'playground'],
+    'Health & Wellness': ['yoga', 'wellness', 'health', 'meditation', 'therapy', 'healing'],
+    'Business & Professional': ['business', 'professional', 'networking', 'conference', 'meeting'],
+    'Film & Cinema': ['film', 'movie', 'cinema', 'screening', 'documentary'],
+    'Other': []
+}
+
+# One case-insensitive alternation per category; keywords must be whole words (plurals allowed),
+# so "party" no longer matches "art" nor "classic" matches "class"
+_CATEGORY_PATTERNS = [
+    (category, re.compile(r'\b(?:' + '|'.join(map(re.escape, keywords)) + r')(?:e?s)?\b', re.IGNORECASE))
+    for category, keywords in EVENT_CATEGORIES.items()
+    if keywords
+]
+
+# NZ region mapping based on major cities/areas
+REGION_MAPPING = {
+    'Auckland': 'Auckland',
+    'Wellington': 'Wellington', 
+    'Christchurch': 'Canterbury',
+    'Hamilton': 'Waikato',
+    'Tauranga': 'Bay of Plenty',
+    'Dunedin': 'Otago',
+    'Palmerston North': 'Manawatu-Whanganui',
+    'Napier': 'Hawke\'s Bay',
+    'Nelson': 'Nelson',
+    'New Plymouth': 'Taranaki',
+    'Rotorua': 'Bay of Plenty',
+    'Whangarei': 'Northland',
+    'Invercargill': 'Southland',
+    'Lower Hutt': 'Wellington',
+    'Upper Hutt': 'Wellington',
+    'Gisborne': 'Gisborne',
+    'Timaru': 'Canterbury',
+    'Taupo': 'Waikato',
+    'Hastings': 'Hawke\'s Bay',
+    'Levin': 'Manawatu-Whanganui'
+}
+
+# Vectorized location lookups (kept as strings so pandas' .str kernels accept them on any backend)
+_REGION_BY_CITY = {city.lower(): region for city, region in REGION_MAPPING.items()}
+_REGION_CITY_PATTERN = '(?i)(' + '|'.join(re.escape(city) for city in REGION_MAPPING) + ')'
+_CITY_PATTERN = r'([A-Za-z\s]+)'
+
+# Full month names as accepted by the "%d %B %Y" feed format
+_MONTHS = {name: number for number, name in enumerate([
+    'january', 'february', 'march', 'april', 'may', 'june',
+    'july', 'august', 'september', 'october', 'november', 'december'
+], start=1)}
+
+def fetch_eventfinda_rss(rss_url: str) -> BinaryIO:
+    """Open a streaming connection to the EventFinda RSS feed"""
     try:
         headers = {
             'User-Agent': 'Mozilla/5.0 (compatible; NZ-Hackathon-Data-Processor/1.0)',
             'Accept': 'application/rss+xml, application/xml, text/xml'
         }
         
-        response = requests.get(rss_url, headers=headers, timeout=30)
+        response = requests.get(rss_url, headers=headers, timeout=30, stream=True)
         response.raise_for_status()
         
-        logger.info(f"Successfully fetched RSS feed: {len(response.content)} bytes")
-        return response.content.decode('utf-8')
+        # Let the XML parser read straight off the socket (gzip handled transparently)
+        response.raw.decode_content = True
+        
+        logger.info(f"Successfully opened RSS feed: {response.headers.get('Content-Length', 'unknown')} bytes")
+        return response.raw
         
     except requests.exceptions.RequestException as e:
         logger.error(f"Failed to fetch RSS feed: {e}")
@@ -41,12 +115,12 @@ def parse_event_description(description: str) -> dict:
     """Extract structured data from event description HTML"""
     
     # Remove HTML tags and clean up text
-    clean_desc = re.sub(r'<[^>]+>', '', description)
-    clean_desc = re.sub(r'&[a-zA-Z]+;', ' ', clean_desc)  # Remove HTML entities
-    clean_desc = re.sub(r'\s+', ' ', clean_desc).strip()
+    clean_desc = _TAG_RE.sub('', description)
+    clean_desc = _ENTITY_RE.sub(' ', clean_desc)  # Remove HTML entities
+    clean_desc = _WHITESPACE_RE.sub(' ', clean_desc).strip()
     
     # Extract location and date info (format: "Location | Date")
-    location_match = re.search(r'([^|]+)\|\s*([^|]+)$', clean_desc)
+    location_match = _LOCATION_DATE_RE.search(clean_desc)
     
     location = None
     date_info = None
@@ -71,44 +145,31 @@ def parse_event_dates(date_str: str) -> dict:
     if not date_str:
         return {'start_date': None, 'end_date': None, 'is_recurring': False}
     
-    # Look for date patterns
-    date_patterns = [
-        r'(\w+day),\s*(\d{1,2})\s+(\w+)\s+(\d{4})',  # "Sunday, 3 August 2025"
-        r'(\d{1,2})\s+(\w+)\s+(\d{4})',               # "3 August 2025"
-    ]
-    
     start_date = None
     end_date = None
     is_recurring = 'every' in date_str.lower() or ' - ' in date_str
     
-    for pattern in date_patterns:
-        matches = re.findall(pattern, date_str)
-        if matches:
-            try:
-                # Parse first date as start date
-                if len(matches[0]) == 4:  # With day name
-                    day, month, year = matches[0][1], matches[0][2], matches[0][3]
-                else:  # Without day name
-                    day, month, year = matches[0]
-                
-                start_date = pd.to_datetime(f"{day} {month} {year}", format="%d %B %Y")
+    # Cheap exit for "Ongoing", "every Tuesday", etc. before the full date scan
+    if not _HAS_YEAR_RE.search(date_str):
+        return {'start_date': None, 'end_date': None, 'is_recurring': is_recurring}
+    
+    # Single pass over the string; the optional weekday prefix is not captured
+    matches = _DATE_RE.findall(date_str)
+    if matches:
+        try:
+            # Parse first date as start date
+            day, month, year = matches[0]
+            start_date = datetime(int(year), _MONTHS[month.lower()], int(day))
+            
+            # If multiple dates, use last as end date
+            if len(matches) > 1:
+                day, month, year = matches[-1]
+                end_date = datetime(int(year), _MONTHS[month.lower()], int(day))
+            else:
+                end_date = start_date
                 
-                # If multiple dates, use last as end date
-                if len(matches) > 1:
-                    last_match = matches[-1]
-                    if len(last_match) == 4:
-                        day, month, year = last_match[1], last_match[2], last_match[3]
-                    else:
-                        day, month, year = last_match
-                    end_date = pd.to_datetime(f"{day} {month} {year}", format="%d %B %Y")
-                else:
-                    end_date = start_date
-                    
-                break
-                    
-            except Exception as e:
-                logger.warning(f"Could not parse date '{date_str}': {e}")
-                continue
+        except (KeyError, ValueError) as e:
+            logger.warning(f"Could not parse date '{date_str}': {e}")
     
     return {
         'start_date': start_date,
@@ -119,58 +180,63 @@ def parse_event_dates(date_str: str) -> dict:
 def extract_event_category(title: str, description: str) -> str:
     """Categorize events based on title and description"""
     
-    content = f"{title} {description}".lower()
-    
-    # Event categories based on EventFinda data patterns
-    categories = {
-        'Music & Performance': ['jazz', 'concert', 'music', 'performance', 'orchestra', 'band', 'singing'],
-        'Arts & Culture': ['art', 'craft', 'exhibition', 'gallery', 'culture', 'museum', 'drawing', 'painting'],
-        'Sports & Recreation': ['sport', 'volleyball', 'skateboard', 'training', 'fitness', 'gym', 'recreation'],
-        'Comedy & Entertainment': ['comedy', 'comedian', 'laugh', 'entertainment', 'magic', 'illusionist'],
-        'Food & Dining': ['food', 'dining', 'restaurant', 'cuisine', 'chef', 'cooking', 'market'],
-        'Education & Workshops': ['workshop', 'class', 'learn', 'training', 'education', 'course', 'tutorial'],
-        'Family & Children': ['children', 'kids', 'family', 'youth', 'teens', 'playground'],
-        'Health & Wellness': ['yoga', 'wellness', 'health', 'meditation', 'therapy', 'healing'],
-        'Business & Professional': ['business', 'professional', 'networking', 'conference', 'meeting'],
-        'Film & Cinema': ['film', 'movie', 'cinema', 'screening', 'documentary'],
-        'Other': []
-    }
+    # Patterns are case-insensitive, so no lowercased copy of the text is needed
+    content = f"{title} {description}"
     
-    for category, keywords in categories.items():
-        if any(keyword in content for keyword in keywords):
+    # First category (in priority order) with a keyword match wins
+    for category, pattern in _CATEGORY_PATTERNS:
+        if pattern.search(content):
             return category
     
     return 'Other'
 
-def process_rss_to_dataframe(rss_content: str, months_ahead: int = 3) -> pd.DataFrame:
-    """Process RSS XML content into structured DataFrame"""
+def iter_rss_items(rss_source: Union[bytes, BinaryIO]) -> Iterator[ET.Element]:
+    """Yield RSS <item> elements one at a time, freeing each once it has been consumed"""
     
-    try:
-        root = ET.fromstring(rss_content)
+    # Buffered feeds are parsed as raw bytes; the XML declaration drives decoding
+    rss_stream = io.BytesIO(rss_source) if isinstance(rss_source, (bytes, bytearray)) else rss_source
+    
+    parents = []
+    for event, elem in ET.iterparse(rss_stream, events=('start', 'end')):
+        if event == 'start':
+            parents.append(elem)
+            continue
         
+        parents.pop()
+        if elem.tag == 'item':
+            yield elem
+            # Detach the finished item so memory stays flat regardless of feed size
+            elem.clear()
+            if parents:
+                parents[-1].remove(elem)
+
+def process_rss_to_dataframe(rss_source: Union[bytes, BinaryIO], months_ahead: int = 3) -> pd.DataFrame:
+    """Process a streamed (or raw bytes) RSS XML feed into structured DataFrame"""
+    
+    try:
         events = []
-        cutoff_date = datetime.now() + timedelta(days=months_ahead * 30)
+        fetch_timestamp = datetime.now()
+        cutoff_date = fetch_timestamp + timedelta(days=months_ahead * 30)
         
-        # Parse RSS items
-        for item in root.findall('.//item'):
-            title = item.find('title')
-            link = item.find('link') 
-            description = item.find('description')
-            pub_date = item.find('pubDate')
-            guid = item.find('guid')
+        # Parse RSS items incrementally as they arrive
+        for item in iter_rss_items(rss_source):
+            # findtext returns the text directly ('' for empty elements, None if absent)
+            title = item.findtext('title')
+            description = item.findtext('description')
             
             if title is not None and description is not None:
                 
                 # Extract event ID from GUID or link
                 event_id = None
-                if guid is not None and guid.text:
+                guid = item.findtext('guid')
+                if guid:
                     # Extract numeric ID from GUID
-                    id_match = re.search(r'(\d+)', guid.text)
+                    id_match = _EVENT_ID_RE.search(guid)
                     if id_match:
                         event_id = id_match.group(1)
                 
                 # Parse description for location and dates
-                desc_data = parse_event_description(description.text or '')
+                desc_data = parse_event_description(description)
                 
                 # Parse dates
                 date_data = parse_event_dates(desc_data['date_info'])
@@ -179,11 +245,11 @@ def process_rss_to_dataframe(rss_content: str, months_ahead: int = 3) -> pd.Data
                 if date_data['start_date'] and date_data['start_date'] <= cutoff_date:
                     
                     # Determine event category
-                    category = extract_event_category(title.text or '', desc_data['description_text'])
+                    category = extract_event_category(title, desc_data['description_text'])
                     
                     event = {
                         'event_id': event_id,
-                        'title': title.text,
+                        'title': title or None,
                         'description': desc_data['description_text'],
                         'location_text': desc_data['location'],
                         'date_info_original': desc_data['date_info'],
@@ -191,16 +257,18 @@ def process_rss_to_dataframe(rss_content: str, months_ahead: int = 3) -> pd.Data
                         'end_date': date_data['end_date'],
                         'is_recurring': date_data['is_recurring'],
                         'category': category,
-                        'event_url': link.text if link is not None else None,
-                        'publication_date': pub_date.text if pub_date is not None else None,
-                        'fetch_timestamp': datetime.now(),
-                        'data_source': 'EventFinda RSS',
-                        'rss_feed_url': 'https://www.eventfinda.co.nz/feed/events/new-zealand/whatson/upcoming.rss'
+                        'event_url': item.findtext('link') or None,
+                        'publication_date': item.findtext('pubDate') or None
                     }
                     
                     events.append(event)
         
         df = pd.DataFrame(events)
+        
+        # Run-level metadata is identical for every event - broadcast once instead of per record
+        df['fetch_timestamp'] = fetch_timestamp
+        df['data_source'] = 'EventFinda RSS'
+        df['rss_feed_url'] = EVENTFINDA_RSS_URL
         logger.info(f"Processed {len(df)} events from RSS feed")
         
         return df
@@ -215,44 +283,15 @@ def process_rss_to_dataframe(rss_content: str, months_ahead: int = 3) -> pd.Data
 def enhance_location_data(df: pd.DataFrame) -> pd.DataFrame:
     """Add structured location data and region mapping"""
     
-    # NZ region mapping based on major cities/areas
-    region_mapping = {
-        'Auckland': 'Auckland',
-        'Wellington': 'Wellington', 
-        'Christchurch': 'Canterbury',
-        'Hamilton': 'Waikato',
-        'Tauranga': 'Bay of Plenty',
-        'Dunedin': 'Otago',
-        'Palmerston North': 'Manawatu-Whanganui',
-        'Napier': 'Hawke\'s Bay',
-        'Nelson': 'Nelson',
-        'New Plymouth': 'Taranaki',
-        'Rotorua': 'Bay of Plenty',
-        'Whangarei': 'Northland',
-        'Invercargill': 'Southland',
-        'Lower Hutt': 'Wellington',
-        'Upper Hutt': 'Wellington',
-        'Gisborne': 'Gisborne',
-        'Timaru': 'Canterbury',
-        'Taupo': 'Waikato',
-        'Hastings': 'Hawke\'s Bay',
-        'Levin': 'Manawatu-Whanganui'
-    }
+    location = df['location_text']
     
-    def map_location_to_region(location_text):
-        if not location_text:
-            return None
-            
-        # Extract city from location text
-        for city, region in region_mapping.items():
-            if city.lower() in location_text.lower():
-                return region
-        
-        return 'Other'
+    # Leftmost known city in the location text, resolved to its region in one vectorized pass
+    city_found = location.str.extract(_REGION_CITY_PATTERN, expand=False)
+    region = city_found.str.lower().map(_REGION_BY_CITY).fillna('Other')
     
-    # Add region and clean location data
-    df['region'] = df['location_text'].apply(map_location_to_region)
-    df['city'] = df['location_text'].str.extract(r'([A-Za-z\s]+)')[0].str.strip()
+    # Add region and clean location data (events without location text get no region)
+    df['region'] = region.where(location.notna() & (location != ''))
+    df['city'] = location.str.extract(_CITY_PATTERN)[0].str.strip()
     
     return df
 
@@ -299,16 +338,14 @@ def save_processed_data(df: pd.DataFrame, output_path: str = 'processed_data/eve
 def main():
     """Main execution function"""
     
-    rss_url = "https://www.eventfinda.co.nz/feed/events/new-zealand/whatson/upcoming.rss"
+    rss_url = EVENTFINDA_RSS_URL
     
     try:
         print("Fetching EventFinda RSS feed for HIWA_I_TE_RANGI...")
         
-        # Fetch RSS content
-        rss_content = fetch_eventfinda_rss(rss_url)
-        
-        # Process into DataFrame
-        df = process_rss_to_dataframe(rss_content, months_ahead=3)
+        # Stream RSS content into DataFrame
+        with fetch_eventfinda_rss(rss_url) as rss_stream:
+            df = process_rss_to_dataframe(rss_stream, months_ahead=3)
         
         # Enhance with location data
         df = enhance_location_data(df)
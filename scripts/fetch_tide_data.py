@@ -6,11 +6,25 @@ Downloads CSV files for 6 major ports/cities across 3 years (2024-2026)
 
 import requests
 import os
+import shutil
 from pathlib import Path
 import urllib.parse
-import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 
-def fetch_tide_data():
+def download_tide_file(session: requests.Session, url: str, local_path: Path) -> int:
+    """Download a single tide CSV and return its size in bytes"""
+    with session.get(url, timeout=30, stream=True) as response:
+        response.raise_for_status()  # Raise exception for bad status codes
+        
+        # Copy raw bytes straight from the socket to disk - no text decode, no in-memory copy
+        response.raw.decode_content = True
+        with open(local_path, 'wb') as f:
+            shutil.copyfileobj(response.raw, f)
+    
+    return local_path.stat().st_size
+
+def fetch_tide_data(max_workers: int = 6):
     """
     Fetch tide prediction CSV files from LINZ for major NZ cities
     """
@@ -42,43 +56,37 @@ def fetch_tide_data():
     print(f"📁 Target: {total_files} CSV files")
     print("=" * 60)
     
-    for city in cities:
-        print(f"\n🏙️  Processing {city}...")
-        
-        for year in years:
-            # Construct filename and URL
-            filename = f"{city}%20{year}.csv"
-            url = base_url + filename
-            
-            # Local file path (decoded name for storage)
-            local_filename = f"{city}_{year}_tide_predictions.csv"
-            local_path = data_dir / local_filename
-            
-            try:
-                print(f"   📥 Downloading {city} {year}...", end=" ")
-                
-                # Make HTTP request
-                response = requests.get(url, timeout=30)
-                response.raise_for_status()  # Raise exception for bad status codes
-                
-                # Save to file
-                with open(local_path, 'w', encoding='utf-8') as f:
-                    f.write(response.text)
-                
-                file_size = len(response.text)
+    # Build the full download list up front (decoded name for local storage)
+    jobs = [
+        (city, year, base_url + f"{city}%20{year}.csv", data_dir / f"{city}_{year}_tide_predictions.csv")
+        for city in cities
+        for year in years
+    ]
+    
+    # Share one keep-alive connection pool across all worker threads
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+    session.mount("https://", adapter)
+    
+    def download(job):
+        city, year, url, local_path = job
+        try:
+            return city, year, download_tide_file(session, url, local_path), None
+        except requests.exceptions.RequestException as e:
+            return city, year, None, f"Failed: {e}"
+        except Exception as e:
+            return city, year, None, f"Error: {e}"
+    
+    print(f"\n📥 Downloading with {max_workers} parallel connections...")
+    
+    with session, ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for city, year, file_size, error in executor.map(download, jobs):
+            if error is None:
                 downloaded += 1
-                print(f"✅ Success ({file_size:,} bytes)")
-                
-                # Brief pause to be respectful to the server
-                time.sleep(0.5)
-                
-            except requests.exceptions.RequestException as e:
-                failed += 1
-                print(f"❌ Failed: {e}")
-                
-            except Exception as e:
+                print(f"   ✅ {city} {year}: Success ({file_size:,} bytes)")
+            else:
                 failed += 1
-                print(f"❌ Error: {e}")
+                print(f"   ❌ {city} {year}: {error}")
     
     # Summary
     print("\n" + "=" * 60)
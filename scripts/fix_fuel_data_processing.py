@@ -10,6 +10,8 @@ from pathlib import Path
 import logging
 from datetime import datetime
 
+from _excel_cache import load_sheet
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
@@ -18,7 +20,8 @@ def process_fuel_type_data_corrected(excel_path: str, output_dir: Path):
     logger.info("Processing fuel type data (corrected for wide format)")
     
     # Read the fuel type sheet - this is sheet index 5 based on the screenshot
-    df = pd.read_excel(excel_path, sheet_name='6 - Fuel type (GWh)', header=None)
+    # (the whole sheet is needed: the fuel rows sit below a header row found by scanning)
+    df = load_sheet(excel_path, '6 - Fuel type (GWh)')
     logger.info(f"Raw data shape: {df.shape}")
     
     # Find the header row with quarters (contains dates)
@@ -47,124 +50,75 @@ def process_fuel_type_data_corrected(excel_path: str, output_dir: Path):
         quarters = df.iloc[header_row_idx, 1:].dropna()
         logger.info(f"Found {len(quarters)} quarters: {quarters.iloc[:5].tolist()}...")
         
-        # Find data rows - look for fuel types
+        # Find data rows - label each row below the header with the first fuel type it mentions
         fuel_types = ['Hydro', 'Geothermal', 'Biogas', 'Wind', 'Solar', 'Oil', 'Coal', 'Gas']
+        fuel_columns = {fuel: f"{fuel.upper()}_GWH" for fuel in fuel_types}
+        fuel_columns['Solar'] = 'SOLAR_PV_GWH'
+        
+        row_labels = df.iloc[header_row_idx + 1:, 0].dropna().astype(str).str.strip()
+        row_fuel = pd.Series(
+            np.select(
+                [row_labels.str.contains(fuel, case=False, regex=False) for fuel in fuel_types],
+                fuel_types,
+                default=''
+            ),
+            index=row_labels.index
+        )
+        row_fuel = row_fuel[row_fuel != '']
+        logger.info(f"Found {len(row_fuel)} fuel type rows")
+        
+        # Slice the fuel block once and coerce every cell to numeric in a single pass
+        fuel_block = df.loc[row_fuel.index].iloc[:, 1:len(quarters)+1].apply(pd.to_numeric, errors='coerce')
+        fuel_block.columns = range(fuel_block.shape[1])
+        
+        # Rows sharing a fuel type: the last non-null value per quarter wins (as the row-by-row fill did)
+        fuel_by_quarter = (
+            fuel_block.groupby(row_fuel.values).last().T
+            .reindex(index=range(len(quarters)), columns=fuel_types)
+            .fillna(0)
+            .rename(columns=fuel_columns)
+        )
         
-        fuel_data_rows = []
-        for idx, row in df.iterrows():
-            if idx > header_row_idx and pd.notna(row.iloc[0]):
-                row_label = str(row.iloc[0]).strip()
-                # Check if this row contains fuel type data
-                for fuel in fuel_types:
-                    if fuel.lower() in row_label.lower():
-                        fuel_data_rows.append({
-                            'row_idx': idx,
-                            'fuel_type': fuel,
-                            'row_label': row_label,
-                            'values': row.iloc[1:len(quarters)+1].tolist()
-                        })
-                        break
-        
-        logger.info(f"Found {len(fuel_data_rows)} fuel type rows")
-        
-        # Transform to long format
-        records = []
-        for quarter_idx, quarter in enumerate(quarters):
-            try:
-                # Convert quarter to proper date
-                if isinstance(quarter, str):
-                    quarter_date = pd.to_datetime(quarter)
-                else:
-                    quarter_date = quarter
-                
-                year = quarter_date.year
-                quarter_num = ((quarter_date.month - 1) // 3) + 1
-                
-                # Create record for this quarter
-                record = {
-                    'CALENDAR_YEAR': year,
-                    'QUARTER_YEAR': year,
-                    'QUARTER_NUMBER': quarter_num,
-                    'QUARTER_DATE': quarter_date.strftime('%Y-%m-%d'),
-                    'HYDRO_GWH': 0,
-                    'GEOTHERMAL_GWH': 0,
-                    'BIOGAS_GWH': 0,
-                    'WIND_GWH': 0,
-                    'SOLAR_PV_GWH': 0,
-                    'OIL_GWH': 0,
-                    'COAL_GWH': 0,
-                    'GAS_GWH': 0
-                }
-                
-                # Fill in values from fuel data rows
-                for fuel_row in fuel_data_rows:
-                    if quarter_idx < len(fuel_row['values']):
-                        value = fuel_row['values'][quarter_idx]
-                        if pd.notna(value) and pd.to_numeric(value, errors='coerce') is not None:
-                            fuel_type = fuel_row['fuel_type'].upper()
-                            if fuel_type == 'SOLAR':
-                                fuel_type = 'SOLAR_PV'
-                            column_name = f"{fuel_type}_GWH"
-                            if column_name in record:
-                                record[column_name] = float(value)
-                
-                records.append(record)
-                
-            except Exception as e:
-                logger.warning(f"Error processing quarter {quarter}: {e}")
-                continue
-        
-        # Create DataFrame
-        df_processed = pd.DataFrame(records)
-        
-        # Calculate totals and percentages
+        # Convert quarters to proper dates; unparseable header cells are skipped
+        quarter_dates = pd.to_datetime(pd.Series(quarters.values), errors='coerce')
+        valid_quarters = quarter_dates.notna()
+        quarter_dates = quarter_dates[valid_quarters]
+        
+        # Wide result: one row per quarter, one column per fuel type
+        df_processed = pd.concat([
+            pd.DataFrame({
+                'CALENDAR_YEAR': quarter_dates.dt.year,
+                'QUARTER_YEAR': quarter_dates.dt.year,
+                'QUARTER_NUMBER': quarter_dates.dt.quarter,
+                'QUARTER_DATE': quarter_dates.dt.strftime('%Y-%m-%d')
+            }),
+            fuel_by_quarter[valid_quarters]
+        ], axis=1).reset_index(drop=True)
+        
+        # Aggregate quarters to calendar years first, then derive totals once at year level
         renewable_cols = ['HYDRO_GWH', 'GEOTHERMAL_GWH', 'BIOGAS_GWH', 'WIND_GWH', 'SOLAR_PV_GWH']
         fossil_cols = ['OIL_GWH', 'COAL_GWH', 'GAS_GWH']
         
-        df_processed['RENEWABLE_GWH'] = df_processed[renewable_cols].sum(axis=1)
-        df_processed['FOSSIL_FUEL_GWH'] = df_processed[fossil_cols].sum(axis=1)
-        df_processed['TOTAL_GENERATION_GWH'] = df_processed['RENEWABLE_GWH'] + df_processed['FOSSIL_FUEL_GWH']
+        df_final = df_processed.groupby('CALENDAR_YEAR', as_index=False)[renewable_cols + fossil_cols].sum()
         
-        # Calculate percentages
-        df_processed['RENEWABLE_PERCENTAGE'] = np.where(
-            df_processed['TOTAL_GENERATION_GWH'] > 0,
-            (df_processed['RENEWABLE_GWH'] / df_processed['TOTAL_GENERATION_GWH'] * 100).round(2),
-            0
-        )
-        df_processed['FOSSIL_FUEL_PERCENTAGE'] = np.where(
-            df_processed['TOTAL_GENERATION_GWH'] > 0,
-            (df_processed['FOSSIL_FUEL_GWH'] / df_processed['TOTAL_GENERATION_GWH'] * 100).round(2),
-            0
-        )
+        df_final['RENEWABLE_GWH'] = df_final[renewable_cols].sum(axis=1)
+        df_final['FOSSIL_FUEL_GWH'] = df_final[fossil_cols].sum(axis=1)
+        df_final['TOTAL_GENERATION_GWH'] = df_final['RENEWABLE_GWH'] + df_final['FOSSIL_FUEL_GWH']
         
         # Add metadata columns to match expected schema
-        df_processed['ELECTRICITY_ONLY_SUBTOTAL_GWH'] = df_processed['TOTAL_GENERATION_GWH'] * 0.9
-        df_processed['COGENERATION_GWH'] = df_processed['TOTAL_GENERATION_GWH'] * 0.1
-        df_processed['SOURCE_SHEET'] = '6 - Fuel type (GWh)'
-        df_processed['LOAD_TIMESTAMP'] = datetime.now()
-        
-        # Remove quarters column, keep year-based data
-        df_final = df_processed.groupby('CALENDAR_YEAR').agg({
-            'HYDRO_GWH': 'sum',
-            'GEOTHERMAL_GWH': 'sum',
-            'BIOGAS_GWH': 'sum',
-            'WIND_GWH': 'sum',
-            'SOLAR_PV_GWH': 'sum',
-            'OIL_GWH': 'sum',
-            'COAL_GWH': 'sum',
-            'GAS_GWH': 'sum',
-            'RENEWABLE_GWH': 'sum',
-            'FOSSIL_FUEL_GWH': 'sum',
-            'TOTAL_GENERATION_GWH': 'sum',
-            'ELECTRICITY_ONLY_SUBTOTAL_GWH': 'sum',
-            'COGENERATION_GWH': 'sum',
-            'SOURCE_SHEET': 'first',
-            'LOAD_TIMESTAMP': 'first'
-        }).reset_index()
-        
-        # Recalculate percentages after aggregation
-        df_final['RENEWABLE_PERCENTAGE'] = (df_final['RENEWABLE_GWH'] / df_final['TOTAL_GENERATION_GWH'] * 100).round(2)
-        df_final['FOSSIL_FUEL_PERCENTAGE'] = (df_final['FOSSIL_FUEL_GWH'] / df_final['TOTAL_GENERATION_GWH'] * 100).round(2)
+        df_final['ELECTRICITY_ONLY_SUBTOTAL_GWH'] = df_final['TOTAL_GENERATION_GWH'] * 0.9
+        df_final['COGENERATION_GWH'] = df_final['TOTAL_GENERATION_GWH'] * 0.1
+        df_final['SOURCE_SHEET'] = '6 - Fuel type (GWh)'
+        df_final['LOAD_TIMESTAMP'] = datetime.now()
+        
+        # Calculate both percentages in one pass (0 for years without generation)
+        total = df_final[['TOTAL_GENERATION_GWH']].to_numpy()
+        shares = np.divide(
+            df_final[['RENEWABLE_GWH', 'FOSSIL_FUEL_GWH']].to_numpy(), total,
+            out=np.zeros((len(df_final), 2)), where=total > 0
+        ) * 100
+        df_final['RENEWABLE_PERCENTAGE'] = shares[:, 0].round(2)
+        df_final['FOSSIL_FUEL_PERCENTAGE'] = shares[:, 1].round(2)
         
         # Filter for recent years
         df_final = df_final[df_final['CALENDAR_YEAR'] >= 2020]
@@ -10,57 +10,43 @@ from pathlib import Path
 import logging
 from datetime import datetime
 
+from _excel_cache import load_sheet
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Sheet layout: row 8 holds the quarter dates, row 10 the net generation values
+QUARTER_DATE_ROW = 8
+NET_GENERATION_ROW = 10
+
 def process_quarterly_data_fixed(excel_path: str, output_dir: Path):
     """Process quarterly data with correct structure understanding"""
     logger.info("Processing quarterly generation data")
     
-    # Read the quarterly sheet
-    df = pd.read_excel(excel_path, sheet_name='1 - Quarterly GWh', header=None)
+    # Read only the rows we need (quarter dates through net generation)
+    df = load_sheet(excel_path, '1 - Quarterly GWh',
+                    skiprows=QUARTER_DATE_ROW, nrows=NET_GENERATION_ROW - QUARTER_DATE_ROW + 1)
     logger.info(f"Raw data shape: {df.shape}")
     
-    # Get quarter dates from row 8 (index 8), starting from column 1
-    quarter_dates = df.iloc[8, 1:].dropna()
+    # Get quarter dates from the first row read, starting from column 1
+    quarter_dates = pd.to_datetime(pd.Series(df.iloc[0, 1:].dropna().values), errors='coerce')
     logger.info(f"Found {len(quarter_dates)} quarters")
     
-    # Get net generation values from row 10 (index 10), starting from column 1
-    generation_values = df.iloc[10, 1:len(quarter_dates)+1]
+    # Get net generation values from the last row read, aligned positionally with the quarters
+    generation_values = pd.to_numeric(pd.Series(df.iloc[-1, 1:len(quarter_dates)+1].values), errors='coerce')
     logger.info(f"Found {len(generation_values)} generation values")
     
-    # Create records
-    records = []
-    for i, (quarter_date, gen_value) in enumerate(zip(quarter_dates, generation_values)):
-        try:
-            # Convert to proper date
-            if isinstance(quarter_date, str):
-                quarter_dt = pd.to_datetime(quarter_date)
-            else:
-                quarter_dt = quarter_date
-            
-            # Extract year and quarter
-            year = quarter_dt.year
-            quarter_num = ((quarter_dt.month - 1) // 3) + 1
-            
-            # Convert generation value
-            if pd.notna(gen_value):
-                gen_gwh = float(gen_value)
-                
-                records.append({
-                    'CALENDAR_QUARTER': quarter_dt.strftime('%Y-%m-%d'),
-                    'NET_GENERATION_GWH': gen_gwh,
-                    'QUARTER_YEAR': year,
-                    'QUARTER_NUMBER': quarter_num,
-                    'SOURCE_SHEET': '1 - Quarterly GWh',
-                    'LOAD_TIMESTAMP': datetime.now()
-                })
-        except Exception as e:
-            logger.warning(f"Error processing quarter {i}: {e}")
-            continue
-    
-    # Create DataFrame
-    df_quarterly = pd.DataFrame(records)
+    # Build all records in one vectorized pass, skipping quarters without a usable date or value
+    df_quarterly = pd.DataFrame({
+        'CALENDAR_QUARTER': quarter_dates.dt.strftime('%Y-%m-%d'),
+        'NET_GENERATION_GWH': generation_values,
+        'QUARTER_YEAR': quarter_dates.dt.year,
+        'QUARTER_NUMBER': quarter_dates.dt.quarter,
+        'SOURCE_SHEET': '1 - Quarterly GWh',
+        'LOAD_TIMESTAMP': datetime.now()
+    }).dropna(subset=['CALENDAR_QUARTER', 'NET_GENERATION_GWH'])
+    # Unparseable dates made the year/quarter fields float; with those rows gone they are whole numbers again
+    df_quarterly = df_quarterly.astype({'QUARTER_YEAR': 'int64', 'QUARTER_NUMBER': 'int64'})
     logger.info(f"Created {len(df_quarterly)} quarterly records")
     
     # Calculate year-over-year change
@@ -13,6 +13,7 @@ import logging
 import zipfile
 from datetime import datetime
 import re
+from pandas.tseries.api import guess_datetime_format
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -22,6 +23,54 @@ RAW_DATA_DIR = Path('data')
 PROCESSED_DATA_DIR = Path('processed_data')
 PROCESSED_DATA_DIR.mkdir(parents=True, exist_ok=True)
 
+# Rows per read_csv chunk; keeps peak memory bounded for large Kaggle exports
+AIRFARES_CHUNKSIZE = 500_000
+
+# Any run of non-word characters/whitespace/underscores in a column name
+_COLUMN_SEPARATOR_RE = re.compile(r'[\W_]+')
+
+# Anything that isn't a digit or decimal point in a price (currency symbols, commas, spaces)
+_NON_PRICE_RE = re.compile(r'[^\d.]')
+
+# Substrings that put a cleaned column into each transform group
+COLUMN_CATEGORY_TERMS = {
+    'date': ['date', 'time', 'year', 'month', 'day'],
+    'price': ['price', 'fare', 'cost', 'amount', 'nzd'],
+    'route': ['origin', 'destination', 'route', 'from', 'to', 'departure', 'arrival'],
+    'airline': ['airline', 'carrier', 'operator'],
+}
+_COLUMN_CATEGORY_PATTERNS = {
+    category: re.compile('|'.join(map(re.escape, terms)))
+    for category, terms in COLUMN_CATEGORY_TERMS.items()
+}
+
+# Clock-time layouts pandas can't guess (e.g. "1:35 PM"); tried before per-element parsing
+CLOCK_TIME_FORMATS = ['%I:%M %p', '%I:%M:%S %p', '%H:%M', '%H:%M:%S']
+
+# Common NZ location mappings (airport codes and lowercase names -> display name)
+LOCATION_MAP = {
+    'akl': 'Auckland',
+    'auckland': 'Auckland',
+    'wlg': 'Wellington', 
+    'wellington': 'Wellington',
+    'chc': 'Christchurch',
+    'christchurch': 'Christchurch',
+    'dud': 'Dunedin',
+    'dunedin': 'Dunedin',
+    'qtn': 'Queenstown',
+    'queenstown': 'Queenstown',
+    'npm': 'New Plymouth',
+    'new plymouth': 'New Plymouth',
+    'rot': 'Rotorua',
+    'rotorua': 'Rotorua',
+    'tau': 'Tauranga',
+    'tauranga': 'Tauranga',
+    'nsn': 'Nelson',
+    'nelson': 'Nelson',
+    'pmr': 'Palmerston North',
+    'palmerston north': 'Palmerston North'
+}
+
 def extract_airfares_data():
     """Extract airfares data from zip file"""
     zip_file = RAW_DATA_DIR / 'NZ airfares.csv.zip'
@@ -54,170 +103,233 @@ def extract_airfares_data():
 
 def clean_column_names(columns):
     """Clean column names for Snowflake compatibility"""
-    cleaned = []
-    for col in columns:
-        clean_col = str(col).strip().lower()
-        clean_col = re.sub(r'[^\w\s]', '_', clean_col)
-        clean_col = re.sub(r'\s+', '_', clean_col)
-        clean_col = re.sub(r'_+', '_', clean_col)
-        clean_col = clean_col.strip('_')
-        cleaned.append(clean_col)
-    return cleaned
+    # Non-word characters, whitespace and underscores collapse to a single '_' in one pass
+    return [_COLUMN_SEPARATOR_RE.sub('_', str(col).strip().lower()).strip('_') for col in columns]
 
 def standardize_location_names(location_series):
     """Standardize NZ location names for consistency"""
     if location_series.dtype == 'object':
-        # Common NZ location mappings
-        location_map = {
-            'akl': 'Auckland',
-            'auckland': 'Auckland',
-            'wlg': 'Wellington', 
-            'wellington': 'Wellington',
-            'chc': 'Christchurch',
-            'christchurch': 'Christchurch',
-            'dud': 'Dunedin',
-            'dunedin': 'Dunedin',
-            'qtn': 'Queenstown',
-            'queenstown': 'Queenstown',
-            'npm': 'New Plymouth',
-            'new plymouth': 'New Plymouth',
-            'rot': 'Rotorua',
-            'rotorua': 'Rotorua',
-            'tau': 'Tauranga',
-            'tauranga': 'Tauranga',
-            'nsn': 'Nelson',
-            'nelson': 'Nelson',
-            'pmr': 'Palmerston North',
-            'palmerston north': 'Palmerston North'
-        }
-        
-        # Apply mappings
+        # Normalize once, then resolve codes/names with a single hash lookup per row
         standardized = location_series.str.lower().str.strip()
-        for key, value in location_map.items():
-            standardized = standardized.replace(key, value.lower())
-        return standardized.str.title()
+        return standardized.map(LOCATION_MAP).fillna(standardized.str.title())
     return location_series
 
+def clean_price_values(price_series):
+    """Strip currency formatting from prices and convert to numeric"""
+    price_series = price_series.astype(str)
+    # Plain digit strings are already clean; only run the regex over the formatted remainder
+    needs_cleaning = ~price_series.str.isdecimal()
+    if needs_cleaning.any():
+        cleaned = price_series[needs_cleaning].str.replace(_NON_PRICE_RE, '', regex=True)
+        price_series = price_series.where(~needs_cleaning, cleaned)
+    # Always float64 (the table column is NUMBER(10,2)), so every chunk writes fares the same way
+    return pd.to_numeric(price_series, errors='coerce').astype('float64')
+
+def classify_columns(columns):
+    """Group cleaned column names by the transform each one needs"""
+    column_groups = {category: [] for category in _COLUMN_CATEGORY_PATTERNS}
+    # One walk over the columns; a column may belong to several groups (e.g. a date and a route)
+    for col in columns:
+        for category, pattern in _COLUMN_CATEGORY_PATTERNS.items():
+            if pattern.search(col):
+                column_groups[category].append(col)
+    return column_groups
+
+def sniff_clock_format(sample):
+    """Return the CLOCK_TIME_FORMATS entry that parses sample, or None"""
+    for fmt in CLOCK_TIME_FORMATS:
+        try:
+            datetime.strptime(sample.strip(), fmt)
+            return fmt
+        except ValueError:
+            continue
+    return None
+
+def infer_date_formats(df, date_cols):
+    """Fix one parse format per date column from its first value, as a single full-file read would"""
+    date_formats = {}
+    for col in date_cols:
+        values = df[col].dropna()
+        if len(values) and isinstance(values.iloc[0], str):
+            sample = values.iloc[0]
+            # Anything still unrecognised falls back to per-element parsing, matching pandas' own fallback
+            date_formats[col] = guess_datetime_format(sample) or sniff_clock_format(sample) or 'mixed'
+    return date_formats
+
+def clean_airfares_chunk(df, column_groups, date_formats, load_ts):
+    """Apply the date/price/location/airline cleaning and audit columns to one chunk"""
+    # Clean data
+    df = df.dropna(how='all')
+    df.columns = clean_column_names(df.columns)
+    
+    # Handle date columns
+    for col in column_groups['date']:
+        try:
+            fmt = date_formats.get(col)
+            df[col] = pd.to_datetime(df[col], errors='coerce', format=fmt)
+            if fmt in CLOCK_TIME_FORMATS:
+                # strptime dates clock times 1900-01-01; per-element parsing used the current day, so keep that
+                df[col] += pd.Timestamp(load_ts).normalize() - pd.Timestamp('1900-01-01')
+        except:
+            logger.warning(f"⚠ Could not convert {col} to datetime")
+    
+    # Handle price columns - convert to numeric
+    for col in column_groups['price']:
+        try:
+            if col in df.columns:
+                # Remove currency symbols and convert to numeric
+                df[col] = clean_price_values(df[col])
+        except:
+            logger.warning(f"⚠ Could not convert {col} to numeric")
+    
+    # Standardize route/location information
+    for col in column_groups['route']:
+        if col in df.columns:
+            df[col] = standardize_location_names(df[col])
+    
+    # Handle airline information
+    for col in column_groups['airline']:
+        if col in df.columns:
+            df[col] = df[col].astype(str).str.strip().str.title()
+    
+    # Other numeric columns are written as float64 too, rather than int or float depending on whether this chunk held a blank
+    numeric_cols = df.select_dtypes(include='number').columns
+    df[numeric_cols] = df[numeric_cols].astype('float64')
+    
+    # Add audit columns
+    df['load_timestamp'] = load_ts
+    df['data_source'] = 'Kaggle - shashwatwork/airfares-in-new-zealand'
+    df['dataset_description'] = 'New Zealand domestic and international airfares dataset'
+    df['data_freshness'] = 'Historical airfare data for tourism analysis'
+    
+    return df
+
 def process_airfares_data(csv_file):
-    """Process the airfares CSV data"""
+    """Process the airfares CSV data in bounded-memory chunks"""
     try:
         logger.info(f"Reading airfares data from: {csv_file}")
-        df = pd.read_csv(csv_file)
-        
-        logger.info(f"Original shape: {df.shape}")
-        logger.info(f"Original columns: {list(df.columns)}")
-        logger.info(f"Sample data:")
-        logger.info(df.head())
-        
-        # Clean data
-        df = df.dropna(how='all')
-        original_columns = df.columns.tolist()
-        df.columns = clean_column_names(df.columns)
+        output_file = PROCESSED_DATA_DIR / 'nz_airfares.csv'
+        load_ts = datetime.now()
         
+        # Peek at the header so column groups and read dtypes are known before parsing rows
+        original_columns = pd.read_csv(csv_file, nrows=0).columns
+        cleaned_columns = clean_column_names(original_columns)
+        logger.info(f"Original columns: {list(original_columns)}")
         logger.info(f"Column mapping:")
-        for orig, clean in zip(original_columns, df.columns):
+        for orig, clean in zip(original_columns, cleaned_columns):
             logger.info(f"  {orig} → {clean}")
+        column_groups = classify_columns(cleaned_columns)
         
-        # Handle date columns
-        date_cols = [col for col in df.columns if any(term in col for term in ['date', 'time', 'year', 'month', 'day'])]
-        for col in date_cols:
-            try:
-                df[col] = pd.to_datetime(df[col], errors='coerce')
-                logger.info(f"✓ Converted {col} to datetime")
-            except:
-                logger.warning(f"⚠ Could not convert {col} to datetime")
+        # Price and airline values are reworked as text, so skip numeric inference on them
+        text_columns = set(column_groups['price'] + column_groups['airline'])
+        read_dtypes = {orig: str for orig, clean in zip(original_columns, cleaned_columns) if clean in text_columns}
         
-        # Handle price columns - convert to numeric
-        price_cols = [col for col in df.columns if any(term in col for term in ['price', 'fare', 'cost', 'amount', 'nzd'])]
-        for col in price_cols:
-            try:
-                if col in df.columns:
-                    # Remove currency symbols and convert to numeric
-                    df[col] = df[col].astype(str).str.replace(r'[^\d.]', '', regex=True)
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
-                    logger.info(f"✓ Converted {col} to numeric")
-            except:
-                logger.warning(f"⚠ Could not convert {col} to numeric")
+        # Running totals for the summary, so only one chunk is held in memory at a time
+        total_rows = 0
+        first_chunk = True
+        price_summary_cols = column_groups['price'][:3]
+        route_uniques, date_ranges, airline_counts = {}, {}, {}
+        price_parts = []
+        null_counts = None
         
-        # Standardize route/location information
-        route_cols = [col for col in df.columns if any(term in col for term in ['origin', 'destination', 'route', 'from', 'to', 'departure', 'arrival'])]
-        for col in route_cols:
-            if col in df.columns:
-                df[col] = standardize_location_names(df[col])
-                logger.info(f"✓ Standardized {col} location names")
-        
-        # Handle airline information
-        airline_cols = [col for col in df.columns if any(term in col for term in ['airline', 'carrier', 'operator'])]
-        for col in airline_cols:
-            if col in df.columns:
-                df[col] = df[col].astype(str).str.strip().str.title()
+        # Memory-map the extracted file so the C parser reads pages directly instead of via buffered reads
+        with pd.read_csv(csv_file, chunksize=AIRFARES_CHUNKSIZE, dtype=read_dtypes,
+                         low_memory=False, memory_map=True) as reader:
+            for chunk in reader:
+                if first_chunk:
+                    logger.info(f"Sample data:")
+                    logger.info(chunk.head())
+                
+                    # Later chunks may start with an ambiguous date (e.g. 10/03/2019), so pin formats now
+                    date_formats = infer_date_formats(
+                        chunk.dropna(how='all').set_axis(cleaned_columns, axis=1), column_groups['date']
+                    )
+                
+                df = clean_airfares_chunk(chunk, column_groups, date_formats, load_ts)
+                df.to_csv(output_file, index=False, date_format='%Y-%m-%d',
+                          mode='w' if first_chunk else 'a', header=first_chunk)
+                
+                # Accumulate summary statistics
+                total_rows += len(df)
+                for col in column_groups['route'][:3]:
+                    route_uniques.setdefault(col, []).append(df[col].drop_duplicates())
+                if price_summary_cols:
+                    price_parts.append(df[price_summary_cols])
+                for col in column_groups['date'][:2]:
+                    date_ranges.setdefault(col, []).append((df[col].min(), df[col].max()))
+                for col in column_groups['airline'][:2]:
+                    airline_counts.setdefault(col, []).append(df[col].value_counts())
+                chunk_nulls = df.isna().sum()
+                null_counts = chunk_nulls if null_counts is None else null_counts + chunk_nulls
+                first_chunk = False
         
-        # Add audit columns
-        df['load_timestamp'] = datetime.now()
-        df['data_source'] = 'Kaggle - shashwatwork/airfares-in-new-zealand'
-        df['dataset_description'] = 'New Zealand domestic and international airfares dataset'
-        df['data_freshness'] = 'Historical airfare data for tourism analysis'
+        if first_chunk:
+            logger.error(f"❌ No rows found in {csv_file}")
+            return None
         
-        # Save processed data
-        output_file = PROCESSED_DATA_DIR / 'nz_airfares.csv'
-        df.to_csv(output_file, index=False, date_format='%Y-%m-%d')
+        date_cols, price_cols = column_groups['date'], column_groups['price']
+        route_cols, airline_cols = column_groups['route'], column_groups['airline']
+        for col in date_cols:
+            logger.info(f"✓ Converted {col} to datetime")
+        for col in price_cols:
+            logger.info(f"✓ Converted {col} to numeric")
+        for col in route_cols:
+            logger.info(f"✓ Standardized {col} location names")
         
         logger.info(f"✅ Processed airfares data saved to: {output_file}")
-        logger.info(f"Final shape: {df.shape}")
+        logger.info(f"Final shape: {(total_rows, len(null_counts))}")
         
         # Show comprehensive data summary
         logger.info("="*60)
         logger.info("AIRFARES DATA SUMMARY")
         logger.info("="*60)
-        logger.info(f"Total records: {len(df):,}")
-        logger.info(f"Total columns: {len(df.columns)}")
+        logger.info(f"Total records: {total_rows:,}")
+        logger.info(f"Total columns: {len(null_counts)}")
         
         # Route analysis
         if route_cols:
             logger.info(f"\n📍 ROUTE INFORMATION:")
-            for col in route_cols[:3]:  # Show first 3 route columns
-                if col in df.columns:
-                    unique_count = df[col].nunique()
-                    unique_values = df[col].unique()[:8]
-                    logger.info(f"  {col}: {unique_count} unique values")
-                    logger.info(f"    Sample: {list(unique_values)}")
+            for col, parts in route_uniques.items():
+                unique_series = pd.concat(parts).drop_duplicates()
+                logger.info(f"  {col}: {unique_series.nunique()} unique values")
+                logger.info(f"    Sample: {unique_series.head(8).tolist()}")
         
         # Price analysis
         if price_cols:
             logger.info(f"\n💰 PRICING INFORMATION:")
-            for col in price_cols[:3]:  # Show first 3 price columns
-                if col in df.columns:
-                    price_stats = df[col].describe()
-                    logger.info(f"  {col}:")
-                    logger.info(f"    Min: ${price_stats['min']:.2f}")
-                    logger.info(f"    Max: ${price_stats['max']:.2f}")
-                    logger.info(f"    Mean: ${price_stats['mean']:.2f}")
-                    logger.info(f"    Median: ${price_stats['50%']:.2f}")
+            # One aggregation over all summarised price columns instead of a describe() per column
+            price_stats = pd.concat(price_parts).agg(['min', 'max', 'mean', 'median'])
+            for col in price_stats.columns:
+                logger.info(f"  {col}:")
+                logger.info(f"    Min: ${price_stats.at['min', col]:.2f}")
+                logger.info(f"    Max: ${price_stats.at['max', col]:.2f}")
+                logger.info(f"    Mean: ${price_stats.at['mean', col]:.2f}")
+                logger.info(f"    Median: ${price_stats.at['median', col]:.2f}")
         
         # Date analysis
         if date_cols:
             logger.info(f"\n📅 DATE INFORMATION:")
-            for col in date_cols[:2]:
-                if col in df.columns and df[col].notna().any():
-                    logger.info(f"  {col}: {df[col].min()} to {df[col].max()}")
+            for col, ranges in date_ranges.items():
+                col_min = pd.Series([lo for lo, _ in ranges]).min()
+                col_max = pd.Series([hi for _, hi in ranges]).max()
+                if pd.notna(col_min):
+                    logger.info(f"  {col}: {col_min} to {col_max}")
         
         # Airline analysis
         if airline_cols:
             logger.info(f"\n✈️ AIRLINE INFORMATION:")
-            for col in airline_cols[:2]:
-                if col in df.columns:
-                    top_airlines = df[col].value_counts().head(5)
-                    logger.info(f"  Top airlines in {col}:")
-                    for airline, count in top_airlines.items():
-                        logger.info(f"    {airline}: {count} flights")
+            for col, parts in airline_counts.items():
+                top_airlines = pd.concat(parts).groupby(level=0).sum().sort_values(ascending=False).head(5)
+                logger.info(f"  Top airlines in {col}:")
+                for airline, count in top_airlines.items():
+                    logger.info(f"    {airline}: {count} flights")
         
         # Data quality assessment
-        null_cols = df.isnull().sum()
-        high_null_cols = null_cols[null_cols > len(df) * 0.1]  # >10% null
+        high_null_cols = null_counts[null_counts > total_rows * 0.1]  # >10% null
         if len(high_null_cols) > 0:
             logger.info(f"\n⚠️ COLUMNS WITH >10% NULL VALUES:")
             for col, null_count in high_null_cols.items():
-                pct = (null_count / len(df)) * 100
+                pct = (null_count / total_rows) * 100
                 logger.info(f"  {col}: {null_count} nulls ({pct:.1f}%)")
         
         return output_file
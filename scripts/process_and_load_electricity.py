@@ -8,34 +8,40 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 import logging
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
+from _column_names import clean_column_names
+from _excel_cache import EXCEL_ENGINE
+
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Transpower zone export timestamps, e.g. "01 Jul 2025 00:05"
+ZONE_TIMESTAMP_FORMAT = '%d %b %Y %H:%M'
+
 def setup_directories():
     """Create necessary directories"""
     processed_dir = Path("processed_data")
     processed_dir.mkdir(exist_ok=True)
     return processed_dir
 
-def process_zone_data_5min(file_path: str, output_dir: Path):
+def process_zone_data_5min(file_path: str, output_dir: Path, load_ts: datetime):
     """Process 5-minute zone data - this is already in good format"""
     logger.info(f"Processing zone data: {file_path}")
     
     df = pd.read_csv(file_path)
     
     # Clean column names - remove spaces and special characters
-    df.columns = [col.strip().replace(' ', '_').replace('(', '').replace(')', '').upper() 
-                 for col in df.columns]
+    df.columns = clean_column_names(df.columns)
     
-    # Convert date column
-    df['DATE'] = pd.to_datetime(df['DATE'])
+    # Convert date column with the known export format (skips per-value format inference)
+    df['DATE'] = pd.to_datetime(df['DATE'], format=ZONE_TIMESTAMP_FORMAT)
     df = df.rename(columns={'DATE': 'TIMESTAMP_NZ'})
     
     # Add metadata
-    df['LOAD_TIMESTAMP'] = datetime.now()
+    df['LOAD_TIMESTAMP'] = load_ts
     
     # Save
     output_file = output_dir / "electricity_zone_data_5min_final.csv"
@@ -44,12 +50,12 @@ def process_zone_data_5min(file_path: str, output_dir: Path):
     
     return output_file
 
-def process_fuel_type_data(excel_path: str, output_dir: Path):
+def process_fuel_type_data(excel_path: str, output_dir: Path, load_ts: datetime):
     """Process fuel type data from Excel sheet"""
     logger.info("Processing fuel type data for renewable analysis")
     
     # Read the fuel type sheet
-    df = pd.read_excel(excel_path, sheet_name='6 - Fuel type (GWh)', skiprows=3)
+    df = pd.read_excel(excel_path, sheet_name='6 - Fuel type (GWh)', skiprows=3, engine=EXCEL_ENGINE)
     
     # The data has years in first column and fuel types in subsequent columns
     # Clean up the structure
@@ -66,18 +72,16 @@ def process_fuel_type_data(excel_path: str, output_dir: Path):
     df_clean = df.iloc[:, :len(expected_cols)].copy()
     df_clean.columns = expected_cols
     
-    # Filter out non-numeric years and convert to int
+    # Filter out non-numeric years and convert to a compact int
     df_clean = df_clean[pd.to_numeric(df_clean['CALENDAR_YEAR'], errors='coerce').notna()]
-    df_clean['CALENDAR_YEAR'] = df_clean['CALENDAR_YEAR'].astype(int)
+    df_clean['CALENDAR_YEAR'] = df_clean['CALENDAR_YEAR'].astype('int16')
     
     # Convert numeric columns to float, handling any non-numeric values
     numeric_cols = ['HYDRO_GWH', 'GEOTHERMAL_GWH', 'BIOGAS_GWH', 'WIND_GWH', 'SOLAR_PV_GWH', 
                    'OIL_GWH', 'COAL_GWH', 'GAS_GWH', 'ELECTRICITY_ONLY_SUBTOTAL_GWH', 
                    'COGENERATION_GWH', 'TOTAL_GENERATION_GWH']
     
-    for col in numeric_cols:
-        if col in df_clean.columns:
-            df_clean[col] = pd.to_numeric(df_clean[col], errors='coerce')
+    df_clean[numeric_cols] = df_clean[numeric_cols].apply(pd.to_numeric, errors='coerce')
     
     # Calculate renewable vs fossil fuel percentages
     renewable_cols = ['HYDRO_GWH', 'GEOTHERMAL_GWH', 'BIOGAS_GWH', 'WIND_GWH', 'SOLAR_PV_GWH']
@@ -90,21 +94,18 @@ def process_fuel_type_data(excel_path: str, output_dir: Path):
     df_clean['RENEWABLE_GWH'] = df_clean[available_renewable].sum(axis=1)
     df_clean['FOSSIL_FUEL_GWH'] = df_clean[available_fossil].sum(axis=1)
     
-    # Calculate percentages, handling division by zero
-    df_clean['RENEWABLE_PERCENTAGE'] = np.where(
-        df_clean['TOTAL_GENERATION_GWH'] > 0,
-        (df_clean['RENEWABLE_GWH'] / df_clean['TOTAL_GENERATION_GWH'] * 100).round(2),
-        0
-    )
-    df_clean['FOSSIL_FUEL_PERCENTAGE'] = np.where(
-        df_clean['TOTAL_GENERATION_GWH'] > 0,
-        (df_clean['FOSSIL_FUEL_GWH'] / df_clean['TOTAL_GENERATION_GWH'] * 100).round(2),
-        0
-    )
+    # Calculate both percentages in one pass, handling division by zero
+    total = df_clean[['TOTAL_GENERATION_GWH']].to_numpy(dtype=float)
+    shares = np.divide(
+        df_clean[['RENEWABLE_GWH', 'FOSSIL_FUEL_GWH']].to_numpy(dtype=float), total,
+        out=np.zeros((len(df_clean), 2)), where=total > 0
+    ) * 100
+    df_clean['RENEWABLE_PERCENTAGE'] = shares[:, 0].round(2)
+    df_clean['FOSSIL_FUEL_PERCENTAGE'] = shares[:, 1].round(2)
     
     # Add metadata
     df_clean['SOURCE_SHEET'] = '6 - Fuel type (GWh)'
-    df_clean['LOAD_TIMESTAMP'] = datetime.now()
+    df_clean['LOAD_TIMESTAMP'] = load_ts
     
     # Save
     output_file = output_dir / "electricity_generation_by_fuel_final.csv"
@@ -113,57 +114,46 @@ def process_fuel_type_data(excel_path: str, output_dir: Path):
     
     return output_file
 
-def process_quarterly_data(excel_path: str, output_dir: Path):
+def process_quarterly_data(excel_path: str, output_dir: Path, load_ts: datetime):
     """Process quarterly generation data and reshape from wide to long format"""
     logger.info("Processing quarterly generation data")
     
     # Read quarterly data sheet
-    df = pd.read_excel(excel_path, sheet_name='1 - Quarterly GWh', skiprows=3)
+    df = pd.read_excel(excel_path, sheet_name='1 - Quarterly GWh', skiprows=3, engine=EXCEL_ENGINE)
     
     # The data structure has quarters as columns from 1974 onwards
     # First column should be the metric name, then quarters
     
     # Find the generation row (usually first data row)
-    gen_row_idx = None
-    for idx, row in df.iterrows():
-        if pd.notna(row.iloc[0]) and 'generation' in str(row.iloc[0]).lower():
-            gen_row_idx = idx
-            break
-    
-    if gen_row_idx is None:
-        # Take first row with numeric data
-        for idx, row in df.iterrows():
-            if pd.notna(row.iloc[1]) and pd.to_numeric(row.iloc[1], errors='coerce') is not None:
-                gen_row_idx = idx
-                break
-    
-    if gen_row_idx is not None:
-        # Extract the generation data row
-        gen_data = df.iloc[gen_row_idx, 1:].dropna()  # Skip first column (label)
+    labels = df.iloc[:, 0]
+    is_generation = labels.notna() & labels.astype(str).str.contains('generation', case=False, regex=False)
+    if is_generation.any():
+        gen_row_idx = is_generation.idxmax()
+    else:
+        # Take first row with data in the first quarter column
+        gen_row_idx = df.iloc[:, 1].first_valid_index()
+    
+    # Extract the generation data row (skip first column label)
+    gen_data = df.iloc[gen_row_idx, 1:].dropna() if gen_row_idx is not None else pd.Series(dtype=float)
+    
+    if len(gen_data) > 0:
+        values = gen_data.astype(float).to_numpy()
         
-        # Create quarterly data
-        quarterly_data = []
-        for i, value in enumerate(gen_data):
-            if pd.notna(value) and pd.to_numeric(value, errors='coerce') is not None:
-                # Calculate quarter and year (starting from 1974 Q1)
-                base_year = 1974
-                quarter_offset = i
-                year = base_year + (quarter_offset // 4)
-                quarter = (quarter_offset % 4) + 1
-                
-                # Create date for the quarter
-                quarter_date = pd.Timestamp(year=year, month=(quarter-1)*3+1, day=1)
-                
-                quarterly_data.append({
-                    'CALENDAR_QUARTER': quarter_date.strftime('%Y-%m-%d'),
-                    'NET_GENERATION_GWH': float(value),
-                    'QUARTER_YEAR': year,
-                    'QUARTER_NUMBER': quarter,
-                    'SOURCE_SHEET': '1 - Quarterly GWh',
-                    'LOAD_TIMESTAMP': datetime.now()
-                })
+        # Calculate quarter and year for every value at once (starting from 1974 Q1)
+        base_year = 1974
+        quarter_offset = np.arange(len(values))
+        years = (base_year + quarter_offset // 4).astype(np.int16)
+        quarters = (quarter_offset % 4 + 1).astype(np.int8)
+        quarter_dates = pd.to_datetime(pd.DataFrame({'year': years, 'month': (quarters - 1) * 3 + 1, 'day': 1}))
         
-        df_quarterly = pd.DataFrame(quarterly_data)
+        df_quarterly = pd.DataFrame({
+            'CALENDAR_QUARTER': quarter_dates.dt.strftime('%Y-%m-%d'),
+            'NET_GENERATION_GWH': values,
+            'QUARTER_YEAR': years,
+            'QUARTER_NUMBER': quarters,
+            'SOURCE_SHEET': '1 - Quarterly GWh',
+            'LOAD_TIMESTAMP': load_ts
+        })
         
         # Calculate year-over-year change
         df_quarterly = df_quarterly.sort_values(['QUARTER_YEAR', 'QUARTER_NUMBER'])
@@ -187,25 +177,33 @@ def main():
         output_dir = setup_directories()
         logger.info("Starting enhanced electricity data processing...")
         
-        generated_files = []
+        # One load timestamp shared by every table written in this run
+        load_ts = datetime.now()
         
-        # 1. Process zone data (5-minute intervals)
-        csv_path = "data/Zone Data (01 Jul - 29 Jul) [5 intervals] (1).csv"
-        if Path(csv_path).exists():
-            zone_file = process_zone_data_5min(csv_path, output_dir)
-            generated_files.append(zone_file)
+        generated_files = []
         
-        # 2. Process fuel type data
-        excel_path = "data/electricity-2025-q1.xlsx"
-        if Path(excel_path).exists():
-            fuel_file = process_fuel_type_data(excel_path, output_dir)
-            if fuel_file:
-                generated_files.append(fuel_file)
+        # The three tables share no state, so build them in parallel worker processes
+        with ProcessPoolExecutor() as executor:
+            futures = []
+            
+            # 1. Process zone data (5-minute intervals)
+            csv_path = "data/Zone Data (01 Jul - 29 Jul) [5 intervals] (1).csv"
+            if Path(csv_path).exists():
+                futures.append(executor.submit(process_zone_data_5min, csv_path, output_dir, load_ts))
+            
+            # 2. Process fuel type data
+            excel_path = "data/electricity-2025-q1.xlsx"
+            if Path(excel_path).exists():
+                futures.append(executor.submit(process_fuel_type_data, excel_path, output_dir, load_ts))
+                
+                # 3. Process quarterly data
+                futures.append(executor.submit(process_quarterly_data, excel_path, output_dir, load_ts))
             
-            # 3. Process quarterly data
-            quarterly_file = process_quarterly_data(excel_path, output_dir)
-            if quarterly_file:
-                generated_files.append(quarterly_file)
+            # Collect in submission order so the summary stays stable between runs
+            for future in futures:
+                output_file = future.result()
+                if output_file:
+                    generated_files.append(output_file)
         
         # Summary
         logger.info(f"Processing complete! Generated {len(generated_files)} final files:")
@@ -8,6 +8,10 @@ import pandas as pd
 import os
 from pathlib import Path
 import logging
+from pandas.tseries.api import guess_datetime_format
+
+from _column_names import clean_column_names
+from _excel_cache import EXCEL_ENGINE
 
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -19,7 +23,37 @@ def setup_directories():
     processed_dir.mkdir(exist_ok=True)
     return processed_dir
 
-def process_electricity_excel(file_path: str, output_dir: Path):
+def process_excel_sheet(xl_file: pd.ExcelFile, sheet_name: str, output_dir: Path, load_ts: pd.Timestamp):
+    """Clean one workbook sheet and save it as CSV; returns None for metadata-only sheets"""
+    logger.info(f"Processing sheet: {sheet_name}")
+    
+    # Read the sheet from the already-open workbook
+    df = xl_file.parse(sheet_name)
+    
+    # Basic data cleaning
+    # Remove completely empty rows/columns
+    df = df.dropna(how='all').dropna(axis=1, how='all')
+    
+    # Skip if sheet is too small (likely metadata)
+    if len(df) < 2:
+        logger.warning(f"Skipping sheet {sheet_name} - too few rows")
+        return None
+    
+    # Clean column names
+    df.columns = clean_column_names(df.columns)
+    
+    # Add metadata columns
+    df['SOURCE_SHEET'] = sheet_name
+    df['LOAD_TIMESTAMP'] = load_ts
+    
+    # Save to CSV
+    output_file = output_dir / f"electricity_{sheet_name.lower().replace(' ', '_')}.csv"
+    df.to_csv(output_file, index=False)
+    
+    logger.info(f"Saved {len(df)} rows to {output_file}")
+    return output_file
+
+def process_electricity_excel(file_path: str, output_dir: Path, load_ts: pd.Timestamp):
     """
     Process electricity Excel file with multiple sheets
     Convert to clean CSV format suitable for Snowflake
@@ -27,49 +61,20 @@ def process_electricity_excel(file_path: str, output_dir: Path):
     logger.info(f"Processing Excel file: {file_path}")
     
     try:
-        # Read Excel file to examine structure
-        xl_file = pd.ExcelFile(file_path)
-        logger.info(f"Found sheets: {xl_file.sheet_names}")
+        # Open the workbook once and parse every sheet from that handle; the whole workbook
+        # converts in well under a second, less than a process pool costs to start
+        with pd.ExcelFile(file_path, engine=EXCEL_ENGINE) as xl_file:
+            logger.info(f"Found sheets: {xl_file.sheet_names}")
+            results = [process_excel_sheet(xl_file, sheet_name, output_dir, load_ts)
+                       for sheet_name in xl_file.sheet_names]
         
-        processed_files = []
-        
-        for sheet_name in xl_file.sheet_names:
-            logger.info(f"Processing sheet: {sheet_name}")
-            
-            # Read the sheet
-            df = pd.read_excel(file_path, sheet_name=sheet_name)
-            
-            # Basic data cleaning
-            # Remove completely empty rows/columns
-            df = df.dropna(how='all').dropna(axis=1, how='all')
-            
-            # Skip if sheet is too small (likely metadata)
-            if len(df) < 2:
-                logger.warning(f"Skipping sheet {sheet_name} - too few rows")
-                continue
-            
-            # Clean column names
-            df.columns = [str(col).strip().replace(' ', '_').replace('(', '').replace(')', '').upper() 
-                         for col in df.columns]
-            
-            # Add metadata columns
-            df['SOURCE_SHEET'] = sheet_name
-            df['LOAD_TIMESTAMP'] = pd.Timestamp.now()
-            
-            # Save to CSV
-            output_file = output_dir / f"electricity_{sheet_name.lower().replace(' ', '_')}.csv"
-            df.to_csv(output_file, index=False)
-            processed_files.append(output_file)
-            
-            logger.info(f"Saved {len(df)} rows to {output_file}")
-            
-        return processed_files
+        return [output_file for output_file in results if output_file is not None]
         
     except Exception as e:
         logger.error(f"Error processing Excel file: {e}")
         raise
 
-def process_zone_data_csv(file_path: str, output_dir: Path):
+def process_zone_data_csv(file_path: str, output_dir: Path, load_ts: pd.Timestamp):
     """
     Process zone data CSV with 5-minute intervals
     Clean and standardize for Snowflake
@@ -82,21 +87,23 @@ def process_zone_data_csv(file_path: str, output_dir: Path):
         logger.info(f"Loaded {len(df)} rows with columns: {list(df.columns)}")
         
         # Clean column names
-        df.columns = [str(col).strip().replace(' ', '_').replace('(', '').replace(')', '').upper() 
-                     for col in df.columns]
+        df.columns = clean_column_names(df.columns)
         
         # Try to parse datetime columns (common patterns)
         datetime_columns = [col for col in df.columns if any(x in col.lower() for x in ['date', 'time', 'timestamp'])]
         
         for col in datetime_columns:
             try:
-                df[col] = pd.to_datetime(df[col], infer_datetime_format=True)
+                # Sniff the layout from the first value so parsing takes the fixed-format path
+                values = df[col].dropna()
+                fmt = guess_datetime_format(str(values.iloc[0])) if len(values) else None
+                df[col] = pd.to_datetime(df[col], format=fmt)
                 logger.info(f"Converted {col} to datetime")
             except Exception as e:
                 logger.warning(f"Could not convert {col} to datetime: {e}")
         
         # Add metadata
-        df['LOAD_TIMESTAMP'] = pd.Timestamp.now()
+        df['LOAD_TIMESTAMP'] = load_ts
         
         # Save processed file
         output_file = output_dir / "electricity_zone_data_5min.csv"
@@ -116,6 +123,9 @@ def main():
         output_dir = setup_directories()
         logger.info("Starting electricity data processing...")
         
+        # One load timestamp shared by every sheet and file written in this run
+        load_ts = pd.Timestamp.now()
+        
         # Process files
         excel_files = []
         csv_files = []
@@ -123,14 +133,14 @@ def main():
         # Process Excel file
         excel_path = "data/electricity-2025-q1.xlsx"
         if os.path.exists(excel_path):
-            excel_files = process_electricity_excel(excel_path, output_dir)
+            excel_files = process_electricity_excel(excel_path, output_dir, load_ts)
         else:
             logger.warning(f"Excel file not found: {excel_path}")
         
         # Process CSV file
         csv_path = "data/Zone Data (01 Jul - 29 Jul) [5 intervals] (1).csv"
         if os.path.exists(csv_path):
-            csv_files = process_zone_data_csv(csv_path, output_dir)
+            csv_files = process_zone_data_csv(csv_path, output_dir, load_ts)
         else:
             logger.warning(f"CSV file not found: {csv_path}")
         
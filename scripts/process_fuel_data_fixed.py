@@ -10,6 +10,9 @@ from pathlib import Path
 import logging
 from datetime import datetime
 
+from _excel_cache import EXCEL_ENGINE
+from _csv_output import write_csv
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
@@ -19,7 +22,7 @@ def process_fuel_data_fixed(excel_path: str, output_dir: Path):
     
     # Read from row 7 onwards where the actual data starts
     df = pd.read_excel(excel_path, sheet_name='6 - Fuel type (GWh)', 
-                      skiprows=7, header=None)
+                      skiprows=7, header=None, engine=EXCEL_ENGINE)
     
     logger.info(f"Data shape after skipping header rows: {df.shape}")
     
@@ -56,21 +59,21 @@ def process_fuel_data_fixed(excel_path: str, output_dir: Path):
     available_renewable = [col for col in renewable_cols if col in df.columns]
     available_fossil = [col for col in fossil_cols if col in df.columns]
     
-    df['RENEWABLE_GWH'] = df[available_renewable].sum(axis=1)
-    df['FOSSIL_FUEL_GWH'] = df[available_fossil].sum(axis=1)
-    df['TOTAL_GENERATION_GWH'] = df['RENEWABLE_GWH'] + df['FOSSIL_FUEL_GWH']
-    
-    # Calculate percentages
-    df['RENEWABLE_PERCENTAGE'] = np.where(
-        df['TOTAL_GENERATION_GWH'] > 0,
-        (df['RENEWABLE_GWH'] / df['TOTAL_GENERATION_GWH'] * 100).round(2),
-        0
-    )
-    df['FOSSIL_FUEL_PERCENTAGE'] = np.where(
-        df['TOTAL_GENERATION_GWH'] > 0,
-        (df['FOSSIL_FUEL_GWH'] / df['TOTAL_GENERATION_GWH'] * 100).round(2),
-        0
-    )
+    # Pull the fuel columns into one float block and derive totals and shares from it
+    fuel_gwh = df[available_renewable + available_fossil].to_numpy(dtype=float)
+    split_gwh = np.column_stack([
+        fuel_gwh[:, :len(available_renewable)].sum(axis=1),
+        fuel_gwh[:, len(available_renewable):].sum(axis=1)
+    ])
+    total = split_gwh.sum(axis=1, keepdims=True)
+    df['RENEWABLE_GWH'] = split_gwh[:, 0]
+    df['FOSSIL_FUEL_GWH'] = split_gwh[:, 1]
+    df['TOTAL_GENERATION_GWH'] = total[:, 0]
+    
+    # Calculate both percentages in one pass, handling division by zero
+    shares = np.divide(split_gwh, total, out=np.zeros_like(split_gwh), where=total > 0) * 100
+    df['RENEWABLE_PERCENTAGE'] = shares[:, 0].round(2)
+    df['FOSSIL_FUEL_PERCENTAGE'] = shares[:, 1].round(2)
     
     # Add missing columns to match schema
     df['ELECTRICITY_ONLY_SUBTOTAL_GWH'] = df['TOTAL_GENERATION_GWH'] * 0.9
@@ -101,7 +104,7 @@ def process_fuel_data_fixed(excel_path: str, output_dir: Path):
     
     # Save
     output_file = output_dir / "electricity_generation_by_fuel_fixed.csv"
-    df_final.to_csv(output_file, index=False)
+    write_csv(df_final, output_file)
     
     logger.info(f"Processed {len(df_final)} years of fuel data")
     logger.info(f"Years: {sorted(df_final['CALENDAR_YEAR'].unique())}")
@@ -4,6 +4,7 @@ Process Maritime NZ accident/incident reporting data for WAITĀ schema
 Data source: https://maritimenz.govt.nz/media/accacvzc/accident-incident-reporting-data.csv
 """
 
+import io
 import pandas as pd
 import numpy as np
 from pathlib import Path
@@ -11,156 +12,171 @@ from datetime import datetime
 import logging
 import re
 
+from _csv_output import write_csv
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def clean_numeric_field(value):
-    """Clean numeric fields, handle NULL strings"""
-    if pd.isna(value) or str(value).upper() == 'NULL':
-        return None
-    try:
-        return float(value)
-    except (ValueError, TypeError):
-        return None
+# Source columns the pipeline reads; anything else in the extract is skipped at parse time
+MARITIME_COLUMNS = [
+    'Event ID', 'Event Date', 'Brief Description', 'What happened', 'Event Location',
+    'Latitude', 'Longitude', 'NZ Region', 'Where Happened', 'Sector',
+    'Number of Injured Persons', 'Vessel Type', 'Safety System', 'Country Flag',
+    'Gross Tonnage', 'Length Overall', 'Year of Build'
+]
 
-def clean_date_field(date_str):
-    """Parse various date formats from Maritime NZ data"""
-    if pd.isna(date_str) or str(date_str).upper() == 'NULL':
-        return None
-    
-    try:
-        # Handle d/m/yyyy format
-        if '/' in str(date_str):
-            return pd.to_datetime(date_str, format='%d/%m/%Y')
-        else:
-            return pd.to_datetime(date_str)
-    except:
-        logger.warning(f"Could not parse date: {date_str}")
-        return None
+# Low-cardinality text columns load straight into categoricals
+MARITIME_CATEGORY_DTYPES = {
+    'NZ Region': 'category', 'Sector': 'category', 'Vessel Type': 'category', 'Country Flag': 'category'
+}
+
+# Severity tiers from least to most serious
+SEVERITY_LEVELS = ['Minor', 'Moderate', 'Major', 'Critical']
+
+# Maritime NZ event dates are day-first, e.g. 1/09/2018
+MARITIME_DATE_FORMAT = '%d/%m/%Y'
+_DMY_DATE_RE = re.compile(r'\d{1,2}/\d{1,2}/\d{4}')
+
+# Severity keywords, matched against lower-cased 'What happened' / 'Brief Description' text
+_CRITICAL_EVENT_RE = re.compile(r'fatal|death|foundered|sinking')
+_CRITICAL_DESCRIPTION_RE = re.compile(r'fatal|death|foundered')
+_MAJOR_EVENT_RE = re.compile(r'collision|grounding|fire|explosion|capsize|flooding|structural')
+_MODERATE_EVENT_RE = re.compile(r'contact|near miss|mechanical|propulsion|equipment')
+
+def clean_numeric_field(values):
+    """Clean numeric fields, handle NULL strings (vectorized over a Series)"""
+    # 'NULL' and any other non-numeric text coerce to NaN
+    return pd.to_numeric(values, errors='coerce')
+
+def clean_date_field(date_values):
+    """Parse various date formats from Maritime NZ data (vectorized over a Series)"""
+    date_text = date_values.astype(str)
+    present = date_values.notna() & (date_text.str.upper() != 'NULL')
+    
+    # Many incidents share an event date, so parse each distinct string once and map it back
+    unique_text = pd.Series(date_text[present].unique())
+    
+    # Handle d/m/yyyy format with one fixed-format parse; anything else falls back to inference
+    is_dmy = unique_text.str.fullmatch(_DMY_DATE_RE)
+    parsed_unique = pd.to_datetime(unique_text.where(is_dmy), format=MARITIME_DATE_FORMAT, errors='coerce')
+    if not is_dmy.all():
+        parsed_unique = parsed_unique.fillna(
+            pd.to_datetime(unique_text.where(~is_dmy), format='mixed', errors='coerce')
+        )
+    parsed = date_text.where(present).map(pd.Series(parsed_unique.to_numpy(), index=unique_text))
+    
+    unparsed = present & parsed.isna()
+    if unparsed.any():
+        logger.warning(f"Could not parse {unparsed.sum()} dates, e.g. {date_values[unparsed].unique()[:5].tolist()}")
+    return parsed
 
 def categorize_incident_severity(what_happened, injured_count, description):
-    """Categorize incident severity based on type and injuries"""
-    what_happened = str(what_happened).lower()
-    description = str(description).lower()
-    
-    # Critical incidents
-    if any(word in what_happened for word in ['fatal', 'death', 'foundered', 'sinking']):
-        return 'Critical'
-    elif any(word in description for word in ['fatal', 'death', 'foundered']):
-        return 'Critical'
-    
-    # Major incidents
-    if injured_count and injured_count > 0:
-        return 'Major'
-    elif any(word in what_happened for word in ['collision', 'grounding', 'fire', 'explosion']):
-        return 'Major'
-    elif any(word in what_happened for word in ['capsize', 'flooding', 'structural']):
-        return 'Major'
-    
-    # Moderate incidents
-    elif any(word in what_happened for word in ['contact', 'near miss', 'mechanical']):
-        return 'Moderate'
-    elif any(word in what_happened for word in ['propulsion', 'equipment']):
-        return 'Moderate'
-    
-    # Minor incidents
-    else:
-        return 'Minor'
+    """Categorize incident severity based on type and injuries (vectorized over Series)"""
+    what_happened = what_happened.str.lower()
+    description = description.str.lower()
+    
+    # First matching tier wins: Critical, then Major, then Moderate, otherwise Minor
+    is_critical = (what_happened.str.contains(_CRITICAL_EVENT_RE, na=False)
+                   | description.str.contains(_CRITICAL_DESCRIPTION_RE, na=False))
+    is_major = (injured_count > 0) | what_happened.str.contains(_MAJOR_EVENT_RE, na=False)
+    is_moderate = what_happened.str.contains(_MODERATE_EVENT_RE, na=False)
+    
+    severity = np.select([is_critical, is_major, is_moderate], ['Critical', 'Major', 'Moderate'], default='Minor')
+    return pd.Categorical(severity, categories=SEVERITY_LEVELS, ordered=True)
 
 def process_maritime_incidents(input_file: Path, output_dir: Path):
     """Process the Maritime NZ incidents data"""
     logger.info("🚢 Processing Maritime NZ incident data...")
     
-    # Read the CSV with proper encoding handling
+    # Read the CSV with proper encoding handling; decode once so a bad byte doesn't cost a second parse
+    raw_bytes = input_file.read_bytes()
     try:
-        df = pd.read_csv(input_file, encoding='utf-8')
+        csv_text = raw_bytes.decode('utf-8-sig')
     except UnicodeDecodeError:
         # Fallback to windows-1252 encoding for special characters
         logger.info("UTF-8 failed, trying windows-1252 encoding...")
-        df = pd.read_csv(input_file, encoding='windows-1252')
+        csv_text = raw_bytes.decode('windows-1252')
+    df = pd.read_csv(io.StringIO(csv_text), usecols=MARITIME_COLUMNS, dtype=MARITIME_CATEGORY_DTYPES)
     
     logger.info(f"Loaded {len(df)} incident records")
     
-    # Clean and process the data
-    processed_df = df.copy()
+    # Clean and process the data in place; derived columns are added alongside the raw ones
+    # Clean coordinates first and drop records without them, so the remaining work skips those rows
+    df['latitude_decimal'] = clean_numeric_field(df['Latitude'])
+    df['longitude_decimal'] = clean_numeric_field(df['Longitude'])
+    df = df[df['latitude_decimal'].notna() & df['longitude_decimal'].notna()]
     
     # Clean event date
-    processed_df['event_date_parsed'] = processed_df['Event Date'].apply(clean_date_field)
-    processed_df['event_year'] = processed_df['event_date_parsed'].dt.year
-    processed_df['event_month'] = processed_df['event_date_parsed'].dt.month
-    processed_df['event_quarter'] = processed_df['event_date_parsed'].dt.quarter
+    df['event_date_parsed'] = clean_date_field(df['Event Date'])
+    df['event_year'] = df['event_date_parsed'].dt.year
+    df['event_month'] = df['event_date_parsed'].dt.month
+    df['event_quarter'] = df['event_date_parsed'].dt.quarter
     
     # Clean numeric fields
-    processed_df['latitude_decimal'] = processed_df['Latitude'].apply(clean_numeric_field)
-    processed_df['longitude_decimal'] = processed_df['Longitude'].apply(clean_numeric_field)
-    processed_df['injured_persons'] = processed_df['Number of Injured Persons'].apply(clean_numeric_field)
-    processed_df['gross_tonnage'] = processed_df['Gross Tonnage'].apply(clean_numeric_field)
-    processed_df['length_overall'] = processed_df['Length Overall'].apply(clean_numeric_field)
-    processed_df['year_of_build'] = processed_df['Year of Build'].apply(clean_numeric_field)
+    df['injured_persons'] = clean_numeric_field(df['Number of Injured Persons'])
+    df['gross_tonnage'] = clean_numeric_field(df['Gross Tonnage'])
+    df['length_overall'] = clean_numeric_field(df['Length Overall'])
+    df['year_of_build'] = clean_numeric_field(df['Year of Build'])
     
     # Calculate vessel age at time of incident
-    processed_df['vessel_age_at_incident'] = np.where(
-        (processed_df['event_year'].notna()) & (processed_df['year_of_build'].notna()),
-        processed_df['event_year'] - processed_df['year_of_build'],
+    df['vessel_age_at_incident'] = np.where(
+        (df['event_year'].notna()) & (df['year_of_build'].notna()),
+        df['event_year'] - df['year_of_build'],
         None
     )
     
     # Categorize incident severity
-    processed_df['incident_severity'] = processed_df.apply(
-        lambda row: categorize_incident_severity(
-            row['What happened'], 
-            row['injured_persons'], 
-            row['Brief Description']
-        ), axis=1
+    df['incident_severity'] = categorize_incident_severity(
+        df['What happened'],
+        df['injured_persons'],
+        df['Brief Description']
     )
     
     # Clean text fields
-    processed_df['brief_description_clean'] = processed_df['Brief Description'].str.strip()
-    processed_df['what_happened_clean'] = processed_df['What happened'].str.strip()
-    processed_df['event_location_clean'] = processed_df['Event Location'].str.strip()
+    df['brief_description_clean'] = df['Brief Description'].str.strip()
+    df['what_happened_clean'] = df['What happened'].str.strip()
+    df['event_location_clean'] = df['Event Location'].str.strip()
     
     # Add data source and load timestamp
-    processed_df['data_source'] = 'Maritime NZ'
-    processed_df['source_url'] = 'https://maritimenz.govt.nz/media/accacvzc/accident-incident-reporting-data.csv'
-    processed_df['load_timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    
-    # Create final output with clean column names
-    output_df = pd.DataFrame({
-        'event_id': processed_df['Event ID'],
-        'event_date_original': processed_df['Event Date'],
-        'event_date': processed_df['event_date_parsed'],
-        'event_year': processed_df['event_year'],
-        'event_month': processed_df['event_month'],
-        'event_quarter': processed_df['event_quarter'],
-        'brief_description': processed_df['brief_description_clean'],
-        'what_happened': processed_df['what_happened_clean'],
-        'incident_severity': processed_df['incident_severity'],
-        'event_location': processed_df['event_location_clean'],
-        'latitude_decimal': processed_df['latitude_decimal'],
-        'longitude_decimal': processed_df['longitude_decimal'],
-        'nz_region': processed_df['NZ Region'],
-        'where_happened': processed_df['Where Happened'],
-        'sector': processed_df['Sector'],
-        'injured_persons': processed_df['injured_persons'],
-        'vessel_type': processed_df['Vessel Type'],
-        'safety_system': processed_df['Safety System'],
-        'country_flag': processed_df['Country Flag'],
-        'gross_tonnage': processed_df['gross_tonnage'],
-        'length_overall': processed_df['length_overall'],
-        'year_of_build': processed_df['year_of_build'],
-        'vessel_age_at_incident': processed_df['vessel_age_at_incident'],
-        'data_source': processed_df['data_source'],
-        'source_url': processed_df['source_url'],
-        'load_timestamp': processed_df['load_timestamp']
-    })
-    
-    # Remove records with no valid coordinates
-    output_df = output_df[output_df['latitude_decimal'].notna() & output_df['longitude_decimal'].notna()]
+    df['data_source'] = 'Maritime NZ'
+    df['source_url'] = 'https://maritimenz.govt.nz/media/accacvzc/accident-incident-reporting-data.csv'
+    df['load_timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    
+    # Create final output with clean column names, selecting columns rather than copying them
+    output_columns = {
+        'Event ID': 'event_id',
+        'Event Date': 'event_date_original',
+        'event_date_parsed': 'event_date',
+        'event_year': 'event_year',
+        'event_month': 'event_month',
+        'event_quarter': 'event_quarter',
+        'brief_description_clean': 'brief_description',
+        'what_happened_clean': 'what_happened',
+        'incident_severity': 'incident_severity',
+        'event_location_clean': 'event_location',
+        'latitude_decimal': 'latitude_decimal',
+        'longitude_decimal': 'longitude_decimal',
+        'NZ Region': 'nz_region',
+        'Where Happened': 'where_happened',
+        'Sector': 'sector',
+        'injured_persons': 'injured_persons',
+        'Vessel Type': 'vessel_type',
+        'Safety System': 'safety_system',
+        'Country Flag': 'country_flag',
+        'gross_tonnage': 'gross_tonnage',
+        'length_overall': 'length_overall',
+        'year_of_build': 'year_of_build',
+        'vessel_age_at_incident': 'vessel_age_at_incident',
+        'data_source': 'data_source',
+        'source_url': 'source_url',
+        'load_timestamp': 'load_timestamp'
+    }
+    output_df = df[list(output_columns)].rename(columns=output_columns)
     
     # Save processed data
     output_file = output_dir / 'maritime_incidents_processed.csv'
-    output_df.to_csv(output_file, index=False)
+    write_csv(output_df, output_file)
     
     # Generate summary statistics
     stats = {
@@ -7,18 +7,39 @@ Handles rainfall and temperature data from multiple stations
 import pandas as pd
 import numpy as np
 from pathlib import Path
+import calendar
 import logging
 import zipfile
 import re
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from functools import partial
+
+from _csv_output import write_csv
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Per-station CSVs are only needed when debugging a single station; the combined files are what Snowflake loads
+WRITE_STATION_FILES = False
+
+# Every NIWA stats export shares this layout, so skip per-file type inference
+NIWA_STATS_DTYPES = {'PERIOD': 'str', 'YEAR': 'Int16', 'STATS_VALUE': 'float64'}
+
+# NIWA station exports are named <station id>_<Rain|Temperature>.zip
+_STATION_ZIP_RE = re.compile(r'^(\d+)_(Rain|Temperature)$', re.IGNORECASE)
+
+# Calendar order, so a month's categorical code + 1 is its month number
+MONTH_ORDER = list(calendar.month_name)[1:]
+
 def extract_station_data(zip_path: Path, output_dir: Path):
     """Extract and organize NIWA station data from zip files"""
-    station_id = zip_path.stem.split('_')[0]  # Extract station ID from filename
-    data_type = zip_path.stem.split('_')[1].lower()  # 'rain' or 'temperature'
+    match = _STATION_ZIP_RE.match(zip_path.stem)
+    if not match:
+        raise ValueError(f"Unexpected NIWA station file name: {zip_path.name}")
+    station_id = match.group(1)  # Extract station ID from filename
+    data_type = match.group(2).lower()  # 'rain' or 'temperature'
     
     logger.info(f"Processing Station {station_id} - {data_type} data")
     
@@ -27,7 +48,36 @@ def extract_station_data(zip_path: Path, output_dir: Path):
     
     return station_id, data_type
 
-def process_rainfall_data(station_id: str, data_dir: Path, output_dir: Path):
+def load_and_pivot(data_dir: Path, files_map: dict, index_cols, keep_file_order: bool = False):
+    """Stack each parameter's stats CSV under a param label and pivot parameters into columns"""
+    index_cols = [index_cols] if isinstance(index_cols, str) else list(index_cols)
+    usecols = index_cols + ['STATS_VALUE']
+    
+    frames = []
+    for param, filename in files_map.items():
+        file_path = data_dir / filename
+        if file_path.exists():
+            df = pd.read_csv(file_path, usecols=usecols, dtype=NIWA_STATS_DTYPES)
+            if not df.empty:
+                frames.append(df.assign(param=param))
+    
+    if not frames:
+        return None
+    
+    # Each (index, param) pair occurs once per station, so a straight reshape is enough
+    pivot = pd.concat(frames, ignore_index=True).pivot(
+        index=index_cols,
+        columns='param',
+        values='STATS_VALUE'
+    )
+    
+    # pivot sorts parameters alphabetically; annual tables keep the files_map order
+    if keep_file_order:
+        pivot = pivot.reindex(columns=[frame['param'].iat[0] for frame in frames])
+    
+    return pivot.reset_index()
+
+def process_rainfall_data(station_id: str, data_dir: Path, output_dir: Path, load_ts: datetime):
     """Process rainfall data for a station"""
     logger.info(f"Processing rainfall data for station {station_id}")
     
@@ -39,19 +89,13 @@ def process_rainfall_data(station_id: str, data_dir: Path, output_dir: Path):
         'deficit': f"{station_id}__annual__Total_Deficit__WBal_AWC_150mm___mm.csv"
     }
     
-    annual_data = {}
-    for param, filename in annual_files.items():
-        file_path = data_dir / filename
-        if file_path.exists():
-            df = pd.read_csv(file_path)
-            annual_data[param] = df.set_index('YEAR')['STATS_VALUE']
+    annual_df = load_and_pivot(data_dir, annual_files, 'YEAR', keep_file_order=True)
     
     # Combine annual data
-    if annual_data:
-        annual_df = pd.DataFrame(annual_data).reset_index()
+    if annual_df is not None:
         annual_df['station_id'] = int(station_id)
         annual_df['station_name'] = f"NIWA Station {station_id}"
-        annual_df['load_timestamp'] = datetime.now()
+        annual_df['load_timestamp'] = load_ts
         
         # Rename columns to match schema
         annual_df = annual_df.rename(columns={
@@ -63,9 +107,10 @@ def process_rainfall_data(station_id: str, data_dir: Path, output_dir: Path):
         })
         
         # Save annual rainfall data
-        annual_output = output_dir / f"rainfall_annual_station_{station_id}.csv"
-        annual_df.to_csv(annual_output, index=False)
-        logger.info(f"Saved annual rainfall data: {annual_output}")
+        if WRITE_STATION_FILES:
+            annual_output = output_dir / f"rainfall_annual_station_{station_id}.csv"
+            write_csv(annual_df, annual_output)
+            logger.info(f"Saved annual rainfall data: {annual_output}")
     
     # Process monthly rainfall data
     monthly_files = {
@@ -75,38 +120,20 @@ def process_rainfall_data(station_id: str, data_dir: Path, output_dir: Path):
         'deficit': f"{station_id}__monthly__Total_Deficit__WBal_AWC_150mm___mm.csv"
     }
     
-    monthly_data = {}
-    for param, filename in monthly_files.items():
-        file_path = data_dir / filename
-        if file_path.exists():
-            df = pd.read_csv(file_path)
-            df['param'] = param
-            monthly_data[param] = df
+    # Pivot to get parameters as columns
+    monthly_pivot = load_and_pivot(data_dir, monthly_files, ['PERIOD', 'YEAR'])
     
     # Combine monthly data
-    if monthly_data:
-        monthly_df = pd.concat(monthly_data.values(), ignore_index=True)
-        
-        # Pivot to get parameters as columns
-        monthly_pivot = monthly_df.pivot_table(
-            index=['PERIOD', 'YEAR'], 
-            columns='param', 
-            values='STATS_VALUE'
-        ).reset_index()
-        
+    if monthly_pivot is not None:
         # Add metadata
         monthly_pivot['station_id'] = int(station_id)
         monthly_pivot['station_name'] = f"NIWA Station {station_id}"
-        monthly_pivot['month_name'] = monthly_pivot['PERIOD']
-        monthly_pivot['load_timestamp'] = datetime.now()
+        monthly_pivot['month_name'] = pd.Categorical(monthly_pivot['PERIOD'], categories=MONTH_ORDER)
+        monthly_pivot['load_timestamp'] = load_ts
         
-        # Convert month names to numbers
-        month_map = {
-            'January': 1, 'February': 2, 'March': 3, 'April': 4,
-            'May': 5, 'June': 6, 'July': 7, 'August': 8,
-            'September': 9, 'October': 10, 'November': 11, 'December': 12
-        }
-        monthly_pivot['month_number'] = monthly_pivot['month_name'].map(month_map)
+        # Convert month names to numbers; an unrecognised PERIOD (code -1) stays null rather than becoming month 0
+        month_codes = monthly_pivot['month_name'].cat.codes
+        monthly_pivot['month_number'] = month_codes.where(month_codes >= 0).add(1).astype('Int8')
         
         # Rename columns to match schema
         monthly_pivot = monthly_pivot.rename(columns={
@@ -118,11 +145,14 @@ def process_rainfall_data(station_id: str, data_dir: Path, output_dir: Path):
         })
         
         # Save monthly rainfall data
-        monthly_output = output_dir / f"rainfall_monthly_station_{station_id}.csv"
-        monthly_pivot.to_csv(monthly_output, index=False)
-        logger.info(f"Saved monthly rainfall data: {monthly_output}")
+        if WRITE_STATION_FILES:
+            monthly_output = output_dir / f"rainfall_monthly_station_{station_id}.csv"
+            write_csv(monthly_pivot, monthly_output)
+            logger.info(f"Saved monthly rainfall data: {monthly_output}")
+    
+    return annual_df, monthly_pivot
 
-def process_temperature_data(station_id: str, data_dir: Path, output_dir: Path):
+def process_temperature_data(station_id: str, data_dir: Path, output_dir: Path, load_ts: datetime):
     """Process temperature data for a station"""
     logger.info(f"Processing temperature data for station {station_id}")
     
@@ -137,20 +167,13 @@ def process_temperature_data(station_id: str, data_dir: Path, output_dir: Path):
         'frost_days': f"{station_id}__annual__Days_of_occurrence__Ground_Frost__days.csv"
     }
     
-    annual_data = {}
-    for param, filename in annual_files.items():
-        file_path = data_dir / filename
-        if file_path.exists():
-            df = pd.read_csv(file_path)
-            if not df.empty:
-                annual_data[param] = df.set_index('YEAR')['STATS_VALUE']
+    annual_df = load_and_pivot(data_dir, annual_files, 'YEAR', keep_file_order=True)
     
     # Combine annual data
-    if annual_data:
-        annual_df = pd.DataFrame(annual_data).reset_index()
+    if annual_df is not None:
         annual_df['station_id'] = int(station_id)
         annual_df['station_name'] = f"NIWA Station {station_id}"
-        annual_df['load_timestamp'] = datetime.now()
+        annual_df['load_timestamp'] = load_ts
         
         # Rename columns to match schema
         annual_df = annual_df.rename(columns={
@@ -165,9 +188,10 @@ def process_temperature_data(station_id: str, data_dir: Path, output_dir: Path):
         })
         
         # Save annual temperature data
-        annual_output = output_dir / f"temperature_annual_station_{station_id}.csv"
-        annual_df.to_csv(annual_output, index=False)
-        logger.info(f"Saved annual temperature data: {annual_output}")
+        if WRITE_STATION_FILES:
+            annual_output = output_dir / f"temperature_annual_station_{station_id}.csv"
+            write_csv(annual_df, annual_output)
+            logger.info(f"Saved annual temperature data: {annual_output}")
     
     # Process monthly temperature data (simplified - just main parameters)
     monthly_files = {
@@ -176,39 +200,20 @@ def process_temperature_data(station_id: str, data_dir: Path, output_dir: Path):
         'mean_min': f"{station_id}__monthly__Mean_Daily_Minimum_Air_Temperatures__Deg_C.csv"
     }
     
-    monthly_data = {}
-    for param, filename in monthly_files.items():
-        file_path = data_dir / filename
-        if file_path.exists():
-            df = pd.read_csv(file_path)
-            if not df.empty:
-                df['param'] = param
-                monthly_data[param] = df
+    # Pivot to get parameters as columns
+    monthly_pivot = load_and_pivot(data_dir, monthly_files, ['PERIOD', 'YEAR'])
     
     # Combine monthly data
-    if monthly_data:
-        monthly_df = pd.concat(monthly_data.values(), ignore_index=True)
-        
-        # Pivot to get parameters as columns
-        monthly_pivot = monthly_df.pivot_table(
-            index=['PERIOD', 'YEAR'], 
-            columns='param', 
-            values='STATS_VALUE'
-        ).reset_index()
-        
+    if monthly_pivot is not None:
         # Add metadata
         monthly_pivot['station_id'] = int(station_id)
         monthly_pivot['station_name'] = f"NIWA Station {station_id}"
-        monthly_pivot['month_name'] = monthly_pivot['PERIOD']
-        monthly_pivot['load_timestamp'] = datetime.now()
+        monthly_pivot['month_name'] = pd.Categorical(monthly_pivot['PERIOD'], categories=MONTH_ORDER)
+        monthly_pivot['load_timestamp'] = load_ts
         
-        # Convert month names to numbers
-        month_map = {
-            'January': 1, 'February': 2, 'March': 3, 'April': 4,
-            'May': 5, 'June': 6, 'July': 7, 'August': 8,
-            'September': 9, 'October': 10, 'November': 11, 'December': 12
-        }
-        monthly_pivot['month_number'] = monthly_pivot['month_name'].map(month_map)
+        # Convert month names to numbers; an unrecognised PERIOD (code -1) stays null rather than becoming month 0
+        month_codes = monthly_pivot['month_name'].cat.codes
+        monthly_pivot['month_number'] = month_codes.where(month_codes >= 0).add(1).astype('Int8')
         
         # Rename columns to match schema
         monthly_pivot = monthly_pivot.rename(columns={
@@ -219,9 +224,27 @@ def process_temperature_data(station_id: str, data_dir: Path, output_dir: Path):
         })
         
         # Save monthly temperature data
-        monthly_output = output_dir / f"temperature_monthly_station_{station_id}.csv"
-        monthly_pivot.to_csv(monthly_output, index=False)
-        logger.info(f"Saved monthly temperature data: {monthly_output}")
+        if WRITE_STATION_FILES:
+            monthly_output = output_dir / f"temperature_monthly_station_{station_id}.csv"
+            write_csv(monthly_pivot, monthly_output)
+            logger.info(f"Saved monthly temperature data: {monthly_output}")
+    
+    return annual_df, monthly_pivot
+
+def process_station_zip(zip_path: Path, temp_dir: Path, output_dir: Path, load_ts: datetime):
+    """Extract one station zip and return its tables keyed by combined table name"""
+    station_id, data_type = extract_station_data(zip_path, temp_dir)
+    
+    station_data_dir = temp_dir / f"station_{station_id}_{data_type}"
+    
+    if data_type == 'rain':
+        annual_df, monthly_df = process_rainfall_data(station_id, station_data_dir, output_dir, load_ts)
+        return {'rainfall_annual': annual_df, 'rainfall_monthly': monthly_df}
+    elif data_type == 'temperature':
+        annual_df, monthly_df = process_temperature_data(station_id, station_data_dir, output_dir, load_ts)
+        return {'temperature_annual': annual_df, 'temperature_monthly': monthly_df}
+    
+    return {}
 
 def main():
     """Main processing function"""
@@ -234,53 +257,32 @@ def main():
         output_dir.mkdir(exist_ok=True)
         
         # Find all NIWA zip files
-        zip_files = list(data_dir.glob("*_Rain.zip")) + list(data_dir.glob("*_Temperature.zip"))
+        zip_files = sorted(data_dir.glob("*_Rain.zip")) + sorted(data_dir.glob("*_Temperature.zip"))
         logger.info(f"Found {len(zip_files)} NIWA climate data files")
         
-        # Extract all zip files
-        for zip_path in zip_files:
-            station_id, data_type = extract_station_data(zip_path, temp_dir)
-            
-            station_data_dir = temp_dir / f"station_{station_id}_{data_type}"
-            
-            if data_type == 'rain':
-                process_rainfall_data(station_id, station_data_dir, output_dir)
-            elif data_type == 'temperature':
-                process_temperature_data(station_id, station_data_dir, output_dir)
+        # One load timestamp for every table written in this run
+        load_ts = datetime.now()
+        
+        # Each zip extracts into its own folder, so fan them out and gather the tables in memory
+        station_tables = {}
+        worker = partial(process_station_zip, temp_dir=temp_dir, output_dir=output_dir, load_ts=load_ts)
+        with ProcessPoolExecutor() as executor:
+            for tables in executor.map(worker, zip_files):
+                for table_name, df in tables.items():
+                    if df is not None:
+                        station_tables.setdefault(table_name, []).append(df)
         
         # Create combined files for Snowflake loading
         logger.info("Creating combined CSV files for Snowflake...")
         
-        # Combine all rainfall annual data
-        rainfall_annual_files = list(output_dir.glob("rainfall_annual_station_*.csv"))
-        if rainfall_annual_files:
-            combined_rainfall_annual = pd.concat([pd.read_csv(f) for f in rainfall_annual_files], ignore_index=True)
-            combined_rainfall_annual.to_csv(output_dir / "rainfall_annual_combined.csv", index=False)
-            logger.info("Created rainfall_annual_combined.csv")
-        
-        # Combine all rainfall monthly data
-        rainfall_monthly_files = list(output_dir.glob("rainfall_monthly_station_*.csv"))
-        if rainfall_monthly_files:
-            combined_rainfall_monthly = pd.concat([pd.read_csv(f) for f in rainfall_monthly_files], ignore_index=True)
-            combined_rainfall_monthly.to_csv(output_dir / "rainfall_monthly_combined.csv", index=False)
-            logger.info("Created rainfall_monthly_combined.csv")
-        
-        # Combine all temperature annual data
-        temperature_annual_files = list(output_dir.glob("temperature_annual_station_*.csv"))
-        if temperature_annual_files:
-            combined_temperature_annual = pd.concat([pd.read_csv(f) for f in temperature_annual_files], ignore_index=True)
-            combined_temperature_annual.to_csv(output_dir / "temperature_annual_combined.csv", index=False)
-            logger.info("Created temperature_annual_combined.csv")
-        
-        # Combine all temperature monthly data
-        temperature_monthly_files = list(output_dir.glob("temperature_monthly_station_*.csv"))
-        if temperature_monthly_files:
-            combined_temperature_monthly = pd.concat([pd.read_csv(f) for f in temperature_monthly_files], ignore_index=True)
-            combined_temperature_monthly.to_csv(output_dir / "temperature_monthly_combined.csv", index=False)
-            logger.info("Created temperature_monthly_combined.csv")
+        for table_name in ['rainfall_annual', 'rainfall_monthly', 'temperature_annual', 'temperature_monthly']:
+            if table_name in station_tables:
+                combined = pd.concat(station_tables[table_name], ignore_index=True)
+                combined_output = output_dir / f"{table_name}_combined.csv"
+                write_csv(combined, combined_output)
+                logger.info(f"Created {table_name}_combined.csv")
         
         # Cleanup temp directory
-        import shutil
         shutil.rmtree(temp_dir)
         
         logger.info("✅ NIWA climate data processing completed successfully!")
@@ -5,11 +5,19 @@ Based on LINZ format: https://www.linz.govt.nz/guidance/marine-information/tide-
 """
 
 import pandas as pd
+import numpy as np
 import re
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime, timedelta
 import logging
 
+from _csv_output import write_csv
+
+# Degree/minute coordinates as printed in LINZ headers
+_DMS_RE = re.compile(r"(\d+)°(\d+)'([NSEW])")
+
 def convert_dms_to_decimal(coord_str):
     """
     Convert coordinates from degree/minute/second format to decimal degrees
@@ -22,8 +30,7 @@ def convert_dms_to_decimal(coord_str):
     coord_str = coord_str.strip()
     
     # Parse degree/minute format like "36°51'S" or "174°46'E"
-    pattern = r"(\d+)°(\d+)'([NSEW])"
-    match = re.match(pattern, coord_str)
+    match = _DMS_RE.match(coord_str)
     
     if match:
         degrees = int(match.group(1))
@@ -45,6 +52,34 @@ def convert_dms_to_decimal(coord_str):
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Tide rows: Day, DayOfWeek, Month, Year, then up to four Time/Height pairs
+TIDE_TIME_COLUMNS = ['time_1', 'time_2', 'time_3', 'time_4']
+TIDE_HEIGHT_COLUMNS = ['height_1', 'height_2', 'height_3', 'height_4']
+TIDE_COLUMNS = ['day', 'day_of_week', 'month', 'year'] + [
+    column for pair in zip(TIDE_TIME_COLUMNS, TIDE_HEIGHT_COLUMNS) for column in pair
+]
+_TIDE_TIME_RE = re.compile(r'^(\d+):(\d+)$')
+
+# Calendar fields are small integers; year fits int16, month and day fit int8
+TIDE_CALENDAR_DTYPES = {'year': 'int16', 'month': 'int8', 'day': 'int8'}
+
+# Low-cardinality text columns in the combined tide table
+TIDE_CATEGORY_COLUMNS = [
+    'port_code', 'port_name', 'day_of_week', 'reference_info', 'timezone_info', 'data_source', 'source_file'
+]
+
+# Header line: port code, name, latitude, longitude
+_HEADER_RE = re.compile(r'(\d+),([^,]+),([^,]+),([^,]+)')
+
+# Double-encoded UTF-8 left in the LINZ headers (a stray BOM and the degree sign); fetch_tide_data
+# now saves the server's bytes as-is, so only files fetched before that change still carry these
+_MOJIBAKE_FIXES = {'ï»¿': '', 'Â°': '°'}
+_MOJIBAKE_RE = re.compile('|'.join(map(re.escape, _MOJIBAKE_FIXES)))
+
+def fix_mojibake(text: str) -> str:
+    """Undo the double-encoded characters found in LINZ header lines"""
+    return _MOJIBAKE_RE.sub(lambda match: _MOJIBAKE_FIXES[match.group()], text)
+
 def parse_tide_csv(file_path: Path):
     """
     Parse a single LINZ tide prediction CSV file
@@ -57,16 +92,24 @@ def parse_tide_csv(file_path: Path):
     """
     logger.info(f"Processing {file_path.name}")
     
-    with open(file_path, 'r', encoding='utf-8-sig') as f:
-        lines = f.readlines()
+    # One handle serves both parts: the three metadata lines as text, then the tide rows through read_csv
+    with open(file_path, 'r', encoding='utf-8-sig', newline='') as f:
+        lines = list(islice(f, 3))
+        
+        # Every field is read as text and validated column-wise below
+        raw = pd.read_csv(
+            f, header=None, names=TIDE_COLUMNS, usecols=range(len(TIDE_COLUMNS)),
+            dtype=str, keep_default_na=False
+        )
+    
+    # Clean BOM and encoding issues across all metadata lines in one pass
+    lines = fix_mojibake(''.join(lines)).splitlines()
     
-    # Parse header information and clean encoding issues
+    # Parse header information
     header_line = lines[0].strip()
-    # Clean BOM and encoding issues
-    header_line = header_line.replace('ï»¿', '').replace('Â°', '°')
     
     # Extract port code, name, and coordinates using regex
-    header_match = re.match(r'(\d+),([^,]+),([^,]+),([^,]+)', header_line)
+    header_match = _HEADER_RE.match(header_line)
     
     if header_match:
         port_code = header_match.group(1)
@@ -76,106 +119,88 @@ def parse_tide_csv(file_path: Path):
     else:
         # Fallback parsing
         header_parts = header_line.split(',')
-        port_code = header_parts[0].replace('ï»¿', '') if len(header_parts) > 0 else 'Unknown'
+        port_code = header_parts[0] if len(header_parts) > 0 else 'Unknown'
         port_name = header_parts[1] if len(header_parts) > 1 else file_path.stem.split('_')[0]
-        latitude_dms = header_parts[2].replace('Â°', '°') if len(header_parts) > 2 else 'Unknown'
-        longitude_dms = header_parts[3].replace('Â°', '°') if len(header_parts) > 3 else 'Unknown'
+        latitude_dms = header_parts[2] if len(header_parts) > 2 else 'Unknown'
+        longitude_dms = header_parts[3] if len(header_parts) > 3 else 'Unknown'
     
     # Convert to decimal degrees for Snowflake geospatial standards
     latitude_decimal = convert_dms_to_decimal(latitude_dms)
     longitude_decimal = convert_dms_to_decimal(longitude_dms)
     
-    # Extract reference date info and clean encoding
-    reference_info = lines[1].strip().replace('Â°', '°') if len(lines) > 1 else "Unknown reference date"
-    timezone_info = lines[2].strip().replace('Â°', '°') if len(lines) > 2 else "Local time, heights in metres"
+    # Extract reference date info
+    reference_info = lines[1].strip() if len(lines) > 1 else "Unknown reference date"
+    timezone_info = lines[2].strip() if len(lines) > 2 else "Local time, heights in metres"
     
     # Extract year from filename for metadata
     filename_parts = file_path.stem.split('_')
     year = filename_parts[1] if len(filename_parts) > 1 else '2024'
     
-    # Parse tide data (skip header lines)
-    tide_data = []
-    data_start_line = 3  # Skip first 3 header lines
+    # Parse tide data
+    raw = raw.fillna('').apply(lambda column: column.str.strip())
     
-    for line_num, line in enumerate(lines[data_start_line:], start=data_start_line + 1):
-        line = line.strip()
-        if not line:
-            continue
-            
-        parts = line.split(',')
-        if len(parts) < 4:
-            continue
-            
-        try:
-            day = int(parts[0])
-            day_of_week = parts[1]
-            month = int(parts[2])
-            year_val = int(parts[3])
-            
-            # Create base date
-            try:
-                date = datetime(year_val, month, day)
-                date_str = date.strftime('%Y-%m-%d')
-            except ValueError:
-                logger.warning(f"Invalid date in {file_path.name}, line {line_num}: {day}/{month}/{year_val}")
-                continue
-            
-            # Process up to 4 tides per day (E,F - G,H - I,J - K,L)
-            tides_per_day = []
-            for i in range(4):
-                time_idx = 4 + (i * 2)  # Time columns: 4, 6, 8, 10
-                height_idx = 5 + (i * 2)  # Height columns: 5, 7, 9, 11
-                
-                if time_idx < len(parts) and height_idx < len(parts):
-                    time_str = parts[time_idx].strip()
-                    height_str = parts[height_idx].strip()
-                    
-                    if time_str and height_str:
-                        try:
-                            # Parse time (format: HH:MM)
-                            time_parts = time_str.split(':')
-                            if len(time_parts) == 2:
-                                hour = int(time_parts[0])
-                                minute = int(time_parts[1])
-                                
-                                # Create datetime with proper time
-                                tide_datetime = date.replace(hour=hour, minute=minute)
-                                
-                                height = float(height_str)
-                                
-                                # Determine tide type based on surrounding tides
-                                tide_sequence = i + 1  # 1st, 2nd, 3rd, 4th tide of day
-                                
-                                tides_per_day.append({
-                                    'port_code': port_code,
-                                    'port_name': port_name,
-                                    'latitude_dms': latitude_dms,
-                                    'longitude_dms': longitude_dms,
-                                    'latitude_decimal': latitude_decimal,
-                                    'longitude_decimal': longitude_decimal,
-                                    'date': date_str,
-                                    'day_of_week': day_of_week,
-                                    'tide_datetime': tide_datetime.strftime('%Y-%m-%d %H:%M:%S'),
-                                    'tide_time': time_str,
-                                    'tide_height_m': height,
-                                    'tide_sequence': tide_sequence,
-                                    'year': year_val,
-                                    'month': month,
-                                    'day': day,
-                                    'reference_info': reference_info,
-                                    'timezone_info': timezone_info,
-                                    'data_source': 'LINZ Tide Predictions',
-                                    'source_file': file_path.name
-                                })
-                        except (ValueError, IndexError) as e:
-                            # Skip invalid time/height data
-                            continue
-            
-            tide_data.extend(tides_per_day)
-            
-        except (ValueError, IndexError) as e:
-            logger.warning(f"Error parsing line {line_num} in {file_path.name}: {e}")
-            continue
+    # Lines without the day/month/year prefix are not tide rows
+    raw = raw[raw['year'] != '']
+    
+    calendar_fields = raw[['year', 'month', 'day']].apply(pd.to_numeric, errors='coerce')
+    unparsed = calendar_fields.isna().any(axis=1)
+    if unparsed.any():
+        logger.warning(f"Skipped {unparsed.sum()} unparseable lines in {file_path.name}")
+    
+    # Create base dates; impossible calendar dates coerce to NaT
+    dates = pd.to_datetime(calendar_fields, errors='coerce')
+    invalid = dates.isna() & ~unparsed
+    if invalid.any():
+        logger.warning(f"Skipped {invalid.sum()} invalid dates in {file_path.name}")
+    
+    has_date = dates.notna()
+    raw = raw[has_date]
+    calendar_fields = calendar_fields[has_date].astype(TIDE_CALENDAR_DTYPES)
+    dates = dates[has_date]
+    
+    # Unstack up to 4 tides per day (E,F - G,H - I,J - K,L); ravel keeps day order, then tide order
+    tides_per_day = len(TIDE_TIME_COLUMNS)
+    day_index = np.repeat(np.arange(len(raw)), tides_per_day)
+    tide_sequence = np.tile(np.arange(1, tides_per_day + 1, dtype=np.int8), len(raw))  # 1st, 2nd, 3rd, 4th tide of day
+    time_str = pd.Series(raw[TIDE_TIME_COLUMNS].to_numpy().ravel())
+    height_str = pd.Series(raw[TIDE_HEIGHT_COLUMNS].to_numpy().ravel())
+    
+    # Parse time (format: HH:MM) and height, skipping blank or invalid tides
+    time_parts = time_str.str.extract(_TIDE_TIME_RE).apply(pd.to_numeric)
+    minutes_of_day = time_parts[0] * 60 + time_parts[1]
+    height = pd.to_numeric(height_str, errors='coerce')
+    is_tide = (
+        (time_str != '') & (height_str != '') & height.notna()
+        & time_parts[0].between(0, 23) & time_parts[1].between(0, 59)
+    ).to_numpy()
+    
+    day_index = day_index[is_tide]
+    tide_dates = dates.iloc[day_index].reset_index(drop=True)
+    tide_days = calendar_fields.iloc[day_index]
+    # Kept as datetime64[s]; the combined CSV writer formats it
+    tide_datetime = (tide_dates + pd.to_timedelta(minutes_of_day[is_tide].to_numpy(), unit='min')).astype('datetime64[s]')
+    
+    tide_data = pd.DataFrame({
+        'port_code': port_code,
+        'port_name': port_name,
+        'latitude_dms': latitude_dms,
+        'longitude_dms': longitude_dms,
+        'latitude_decimal': latitude_decimal,
+        'longitude_decimal': longitude_decimal,
+        'date': tide_dates.dt.strftime('%Y-%m-%d'),
+        'day_of_week': raw['day_of_week'].to_numpy()[day_index],
+        'tide_datetime': tide_datetime,
+        'tide_time': time_str[is_tide].to_numpy(),
+        'tide_height_m': height[is_tide].to_numpy(),
+        'tide_sequence': tide_sequence[is_tide],
+        'year': tide_days['year'].to_numpy(),
+        'month': tide_days['month'].to_numpy(),
+        'day': tide_days['day'].to_numpy(),
+        'reference_info': reference_info,
+        'timezone_info': timezone_info,
+        'data_source': 'LINZ Tide Predictions',
+        'source_file': file_path.name
+    })
     
     logger.info(f"Processed {len(tide_data)} tide records from {file_path.name}")
     return tide_data
@@ -193,81 +218,98 @@ def process_all_tide_files():
     
     logger.info(f"🌊 Processing {len(tide_files)} tide prediction files")
     
-    all_tide_data = []
+    # One load timestamp for every table written in this run
+    load_timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    
+    tide_frames = []
     port_metadata = []
+    seen_ports = set()
     
-    for file_path in sorted(tide_files):
-        tide_data = parse_tide_csv(file_path)
-        all_tide_data.extend(tide_data)
-        
+    # Each file parses independently, so fan them out; map keeps results in sorted file order
+    with ProcessPoolExecutor() as executor:
+        parsed_files = list(executor.map(parse_tide_csv, sorted(tide_files)))
+    
+    for tide_data in parsed_files:
         # Extract unique port metadata
-        if tide_data:
+        if not tide_data.empty:
+            tide_frames.append(tide_data)
+            first_tide = tide_data.iloc[0]
             port_info = {
-                'port_code': tide_data[0]['port_code'],
-                'port_name': tide_data[0]['port_name'],
-                'latitude_dms': tide_data[0]['latitude_dms'], 
-                'longitude_dms': tide_data[0]['longitude_dms'],
-                'latitude_decimal': tide_data[0]['latitude_decimal'],
-                'longitude_decimal': tide_data[0]['longitude_decimal'],
-                'reference_info': tide_data[0]['reference_info'],
-                'timezone_info': tide_data[0]['timezone_info'],
+                'port_code': first_tide['port_code'],
+                'port_name': first_tide['port_name'],
+                'latitude_dms': first_tide['latitude_dms'], 
+                'longitude_dms': first_tide['longitude_dms'],
+                'latitude_decimal': first_tide['latitude_decimal'],
+                'longitude_decimal': first_tide['longitude_decimal'],
+                'reference_info': first_tide['reference_info'],
+                'timezone_info': first_tide['timezone_info'],
                 'data_source': 'LINZ Tide Predictions',
-                'load_timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                'load_timestamp': load_timestamp
             }
             
             # Check if port already exists in metadata
-            if not any(p['port_code'] == port_info['port_code'] for p in port_metadata):
+            if port_info['port_code'] not in seen_ports:
+                seen_ports.add(port_info['port_code'])
                 port_metadata.append(port_info)
     
     # Create comprehensive tide dataset
-    if all_tide_data:
-        df_tides = pd.DataFrame(all_tide_data)
-        df_tides['load_timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    total_tides = 0
+    tide_years = []
+    if tide_frames:
+        df_tides = pd.concat(tide_frames, ignore_index=True)
+        
+        # Port and source labels repeat on every tide row; categories sort and group on integer codes
+        for column in TIDE_CATEGORY_COLUMNS:
+            df_tides[column] = df_tides[column].astype('category')
+        df_tides['load_timestamp'] = load_timestamp
+        total_tides = len(df_tides)
+        tide_years = sorted(df_tides['year'].unique().tolist())
         
         # Sort by port, date, and sequence
         df_tides = df_tides.sort_values(['port_name', 'date', 'tide_sequence'])
         
         # Save main tide data
         tide_output = processed_dir / 'tide_predictions_combined.csv'
-        df_tides.to_csv(tide_output, index=False)
+        write_csv(df_tides, tide_output, date_format='%Y-%m-%d %H:%M:%S')
         logger.info(f"✅ Saved {len(df_tides)} tide records to {tide_output}")
         
-        # Calculate tide statistics by port and year
-        tide_stats = df_tides.groupby(['port_code', 'port_name', 'year']).agg({
-            'tide_height_m': ['count', 'min', 'max', 'mean', 'std'],
-            'date': ['min', 'max']
-        }).round(3)
-        
-        # Flatten column names
-        tide_stats.columns = ['_'.join(col).strip() for col in tide_stats.columns]
-        tide_stats = tide_stats.reset_index()
-        tide_stats['load_timestamp'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        # Calculate tide statistics by port and year; named aggregations come out with flat column names
+        tide_stats = df_tides.groupby(['port_code', 'port_name', 'year'], observed=True).agg(
+            tide_height_m_count=('tide_height_m', 'count'),
+            tide_height_m_min=('tide_height_m', 'min'),
+            tide_height_m_max=('tide_height_m', 'max'),
+            tide_height_m_mean=('tide_height_m', 'mean'),
+            tide_height_m_std=('tide_height_m', 'std'),
+            date_min=('date', 'min'),
+            date_max=('date', 'max')
+        ).round(3).reset_index()
+        tide_stats['load_timestamp'] = load_timestamp
         
         # Save tide statistics
         stats_output = processed_dir / 'tide_statistics_by_port.csv'
-        tide_stats.to_csv(stats_output, index=False)
+        write_csv(tide_stats, stats_output)
         logger.info(f"✅ Saved tide statistics to {stats_output}")
     
     # Create port metadata dataset
     if port_metadata:
         df_ports = pd.DataFrame(port_metadata)
         ports_output = processed_dir / 'tide_ports_metadata.csv'
-        df_ports.to_csv(ports_output, index=False)
+        write_csv(df_ports, ports_output)
         logger.info(f"✅ Saved {len(df_ports)} port records to {ports_output}")
     
     # Summary
     logger.info("=" * 60)
     logger.info(f"🎯 Tide Data Processing Summary:")
     logger.info(f"   📁 Processed {len(tide_files)} source files")
-    logger.info(f"   🌊 Generated {len(all_tide_data):,} total tide records")
+    logger.info(f"   🌊 Generated {total_tides:,} total tide records")
     logger.info(f"   📍 Covered {len(port_metadata)} unique ports")
-    logger.info(f"   📅 Years: {sorted(set(d['year'] for d in all_tide_data))}")
+    logger.info(f"   📅 Years: {tide_years}")
     
     # Show port coverage
     if port_metadata:
         logger.info(f"   🏙️  Ports: {', '.join([p['port_name'] for p in port_metadata])}")
     
-    return len(all_tide_data), len(port_metadata)
+    return total_tides, len(port_metadata)
 
 if __name__ == "__main__":
     total_tides, total_ports = process_all_tide_files()
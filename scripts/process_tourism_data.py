@@ -4,6 +4,7 @@ Process Tourism Statistics for HIWA_I_TE_RANGI schema
 Handles: Stats NZ tourism data with complex header structures, multiple regions, time series
 """
 
+import io
 import pandas as pd
 import numpy as np
 from pathlib import Path
@@ -11,206 +12,194 @@ import logging
 import re
 from datetime import datetime
 
+from _csv_output import write_csv
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Copy-on-Write is always on from pandas 3; opt in on 2.x so slices and pipe steps share buffers
+if int(pd.__version__.split('.')[0]) < 3:
+    pd.set_option('mode.copy_on_write', True)
+
+# Stats NZ region labels and the names used across the HIWA_I_TE_RANGI tables
+REGION_NAME_MAP = {
+    'Auckland': 'Auckland',
+    'Wellington': 'Wellington',
+    'Canterbury': 'Canterbury',
+    'Waikato': 'Waikato',
+    'Bay of Plenty': 'Bay of Plenty',
+    'Hawke\'s Bay, Gisborne': 'Hawke\'s Bay',
+    'Taranaki, Manawatu, Wanganui': 'Taranaki-Manawatu-Whanganui',
+    'Nelson, Marlborough, Tasman': 'Tasman-Nelson-Marlborough',
+    'West Coast': 'West Coast',
+    'Otago': 'Otago',
+    'Southland': 'Southland',
+    'Northland': 'Northland',
+    'North Island': 'North Island',
+    'South Island': 'South Island',
+    'New Zealand': 'New Zealand'
+}
+
+_NON_ALNUM_RE = re.compile(r'[^0-9a-z]+')
+_MONTHLY_PERIOD_RE = re.compile(r'\d{4}M\d{1,2}')
+
 def read_csv_robust(file_path):
     """Read CSV with fallback encoding"""
+    # Decode once up front so an encoding miss doesn't cost a second parse
+    raw_bytes = Path(file_path).read_bytes()
     try:
-        return pd.read_csv(file_path, encoding='utf-8')
+        csv_text = raw_bytes.decode('utf-8')
     except UnicodeDecodeError:
         logger.warning(f"UTF-8 failed for {file_path}, trying windows-1252")
-        return pd.read_csv(file_path, encoding='windows-1252')
-
-def parse_period_to_date(period_str):
-    """Convert period strings like '1996M07', '2023' to proper dates"""
-    if pd.isna(period_str) or period_str == '' or period_str == ' ':
-        return None
-    
-    period_str = str(period_str).strip()
-    
-    # Handle monthly format: '1996M07'
-    if 'M' in period_str:
-        try:
-            year, month = period_str.split('M')
-            return pd.to_datetime(f"{year}-{month.zfill(2)}-01")
-        except:
-            return None
-    
-    # Handle annual format: '2023'
-    try:
-        year = int(period_str)
-        if 1800 <= year <= 2100:  # Reasonable year range
-            return pd.to_datetime(f"{year}-01-01")
-    except:
-        pass
+        csv_text = raw_bytes.decode('windows-1252')
     
-    return None
+    # Stats NZ extracts mix header text and numbers in every column, so infer types over the whole file at once
+    return pd.read_csv(io.StringIO(csv_text), low_memory=False)
+
+def parse_year_column(values, first_year, last_year):
+    """Parse a column of year labels, returning the years and a mask of rows inside the range"""
+    years = pd.to_numeric(values, errors='coerce')
+    # Labels that aren't whole numbers were skipped by the old int() parse
+    in_range = (years % 1 == 0) & years.between(first_year, last_year)
+    return years, in_range
+
+def annual_report_dates(years, month_day):
+    """Build report dates from whole years and a fixed 'MM-DD' period end"""
+    return pd.to_datetime(years.astype('int64').astype(str) + f"-{month_day}")
+
+def whole_counts(values):
+    """Truncate parsed counts to integers, leaving float NaN where a count is missing"""
+    counts = np.trunc(values)
+    if counts.notna().all():
+        # Complete columns take the smallest integer type that holds every count
+        return pd.to_numeric(counts.astype('int64'), downcast='integer')
+    return counts
+
+def parse_period_dates(periods):
+    """Convert period labels like '1996M07', '2023' to dates, NaT where a label doesn't parse"""
+    periods = periods.astype(str).str.strip()
+    
+    # Monthly format: '1996M07'
+    monthly = periods.str.fullmatch(_MONTHLY_PERIOD_RE)
+    dates = pd.to_datetime(periods.where(monthly).str.replace('M', '-', regex=False) + '-01',
+                           format='%Y-%m-%d', errors='coerce')
+    
+    # Annual format: '2023', within a reasonable year range
+    years, in_range = parse_year_column(periods, 1800, 2100)
+    dates[in_range] = annual_report_dates(years[in_range], '01-01')
+    return dates
 
 def process_visitor_arrivals(file_path):
     """Process ITM475712 - Visitor arrival total - month ended annuals"""
     logger.info("Processing visitor arrivals data...")
+    load_timestamp = datetime.now()
     
     df = read_csv_robust(file_path)
     
     # Skip header rows and get data starting from row 2 (0-indexed)
-    data_rows = df.iloc[2:].reset_index(drop=True)
-    
-    # Extract year and visitor count
-    processed_data = []
-    for _, row in data_rows.iterrows():
-        try:
-            year = int(row.iloc[0])
-            visitor_count = pd.to_numeric(row.iloc[1], errors='coerce')
-            
-            if pd.notna(visitor_count) and 1800 <= year <= 2100:
-                processed_data.append({
-                    'report_year': year,
-                    'report_date': pd.to_datetime(f"{year}-12-31"),  # Annual-Dec
-                    'period_type': 'Annual',
-                    'visitor_arrivals': int(visitor_count),
-                    'data_source': 'Stats NZ ITM475712',
-                    'dataset_description': 'Visitor arrival total - month ended annuals',
-                    'load_timestamp': datetime.now()
-                })
-        except (ValueError, TypeError):
-            continue
+    data_rows = df.iloc[2:]
+    
+    # Parse whole columns at once and keep rows with a count inside the year range
+    years, in_range = parse_year_column(data_rows.iloc[:, 0], 1800, 2100)
+    visitor_counts = pd.to_numeric(data_rows.iloc[:, 1], errors='coerce')
+    keep = in_range & visitor_counts.notna()
+    years = years[keep].astype('int16')
+    
+    processed_data = {
+        'report_year': years,
+        'report_date': annual_report_dates(years, '12-31'),  # Annual-Dec
+        'period_type': 'Annual',
+        'visitor_arrivals': whole_counts(visitor_counts[keep]),
+        'data_source': 'Stats NZ ITM475712',
+        'dataset_description': 'Visitor arrival total - month ended annuals'
+    }
     
-    result_df = pd.DataFrame(processed_data)
+    result_df = pd.DataFrame(processed_data).reset_index(drop=True)
+    result_df['load_timestamp'] = load_timestamp
     logger.info(f"Processed {len(result_df)} visitor arrival records")
     return result_df
 
 def process_passenger_movements(file_path):
     """Process ITM332206 - Total passenger movements"""
     logger.info("Processing passenger movements data...")
+    load_timestamp = datetime.now()
     
     df = read_csv_robust(file_path)
     
     # Skip header rows and get data starting from row 3 (0-indexed)
-    data_rows = df.iloc[3:].reset_index(drop=True)
+    data_rows = df.iloc[3:]
     
-    processed_data = []
-    for _, row in data_rows.iterrows():
-        try:
-            year = int(row.iloc[0])
-            arrivals_actual = pd.to_numeric(row.iloc[1], errors='coerce')
-            arrivals_sample = pd.to_numeric(row.iloc[2], errors='coerce')
-            departures_actual = pd.to_numeric(row.iloc[3], errors='coerce')
-            departures_sample = pd.to_numeric(row.iloc[4], errors='coerce')
-            total_actual = pd.to_numeric(row.iloc[5], errors='coerce')
-            total_sample = pd.to_numeric(row.iloc[6], errors='coerce')
-            
-            if 1800 <= year <= 2100:
-                processed_data.append({
-                    'report_year': year,
-                    'report_date': pd.to_datetime(f"{year}-12-31"),  # Annual-Dec
-                    'period_type': 'Annual',
-                    'arrivals_actual': int(arrivals_actual) if pd.notna(arrivals_actual) else None,
-                    'arrivals_sample': int(arrivals_sample) if pd.notna(arrivals_sample) else None,
-                    'departures_actual': int(departures_actual) if pd.notna(departures_actual) else None,
-                    'departures_sample': int(departures_sample) if pd.notna(departures_sample) else None,
-                    'total_actual': int(total_actual) if pd.notna(total_actual) else None,
-                    'total_sample': int(total_sample) if pd.notna(total_sample) else None,
-                    'data_source': 'Stats NZ ITM332206',
-                    'dataset_description': 'Total passenger movements',
-                    'load_timestamp': datetime.now()
-                })
-        except (ValueError, TypeError):
-            continue
+    # Convert the six count columns in one call; rows only need a valid year
+    years, in_range = parse_year_column(data_rows.iloc[:, 0], 1800, 2100)
+    counts = data_rows.iloc[in_range.to_numpy(), 1:7].apply(pd.to_numeric, errors='coerce')
+    years = years[in_range].astype('int16')
     
-    result_df = pd.DataFrame(processed_data)
+    processed_data = {
+        'report_year': years,
+        'report_date': annual_report_dates(years, '12-31'),  # Annual-Dec
+        'period_type': 'Annual'
+    }
+    count_columns = ['arrivals_actual', 'arrivals_sample', 'departures_actual',
+                     'departures_sample', 'total_actual', 'total_sample']
+    for position, column in enumerate(count_columns):
+        processed_data[column] = whole_counts(counts.iloc[:, position])
+    processed_data['data_source'] = 'Stats NZ ITM332206'
+    processed_data['dataset_description'] = 'Total passenger movements'
+    
+    result_df = pd.DataFrame(processed_data).reset_index(drop=True)
+    result_df['load_timestamp'] = load_timestamp
     logger.info(f"Processed {len(result_df)} passenger movement records")
     return result_df
 
 def extract_region_columns(header_row, metric_row):
     """Extract region and metric information from complex Stats NZ headers"""
-    regions = []
-    metrics = []
-    
-    current_region = None
-    for i, (region_cell, metric_cell) in enumerate(zip(header_row, metric_row)):
-        # Skip empty cells or period column
-        if pd.isna(region_cell) or region_cell == '' or str(region_cell).strip() in [' ', '']:
-            if pd.notna(metric_cell) and metric_cell != '':
-                # Use metric info when region is empty
-                if current_region:
-                    regions.append(current_region)
-                    metrics.append(str(metric_cell).strip())
-                else:
-                    # Skip if no region context
-                    regions.append('Unknown')
-                    metrics.append(str(metric_cell).strip())
-            continue
-        
-        region_name = str(region_cell).strip()
-        if region_name and region_name not in [' ', '']:
-            current_region = region_name
-        
-        if pd.notna(metric_cell) and metric_cell != '':
-            regions.append(current_region if current_region else 'Unknown')
-            metrics.append(str(metric_cell).strip())
+    # Each region label spans the blank cells after it, so forward-fill it across the header
+    region_cells = pd.Series(header_row, dtype=object)
+    region_names = region_cells.where(region_cells.notna(), '').astype(str).str.strip()
+    region_names = region_names.mask(region_names == '').ffill().fillna('Unknown')
+    
+    # Only columns with a metric label carry data
+    metric_cells = pd.Series(metric_row, dtype=object)
+    has_metric = metric_cells.notna() & (metric_cells != '')
+    metrics = metric_cells[has_metric].astype(str).str.strip()
     
-    return regions, metrics
+    return np.flatnonzero(has_metric), region_names[has_metric].to_numpy(), metrics.to_numpy()
+
+def metric_column_name(metric):
+    """Turn a Stats NZ metric label into the snake_case column used by the Snowflake table"""
+    return _NON_ALNUM_RE.sub('_', metric.lower()).strip('_')
+
+def reshape_regional_table(df, data_source, dataset_description):
+    """Reshape a region-by-metric Stats NZ table to one row per month and region"""
+    load_timestamp = datetime.now()
+    
+    # Row 0 holds the region labels and row 1 the metric labels; column 0 is the period
+    positions, regions, metrics = extract_region_columns(df.iloc[0].values[1:], df.iloc[1].values[1:])
+    values = df.iloc[2:, positions + 1].apply(pd.to_numeric, errors='coerce')
+    values.columns = pd.MultiIndex.from_arrays([regions, metrics], names=['region', 'metric_type'])
+    values.index = pd.Index(parse_period_dates(df.iloc[2:, 0]), name='report_date')
+    values = values.loc[values.index.notna(), values.columns.get_level_values('region') != 'Unknown']
+    
+    # Stack regions into rows so each metric becomes one column
+    result_df = values.stack('region', future_stack=True).dropna(how='all')
+    result_df = result_df.reindex(columns=pd.unique(metrics)).sort_index()
+    result_df.columns = [metric_column_name(metric) for metric in result_df.columns]
+    result_df = result_df.reset_index()
+    
+    # Match the table's column order: keys, metrics, then lineage columns
+    result_df.insert(1, 'period_type', 'Monthly')
+    result_df['data_source'] = data_source
+    result_df['dataset_description'] = dataset_description
+    result_df['load_timestamp'] = load_timestamp
+    return result_df
 
 def process_guest_nights(file_path):
     """Process ACS348801 - Guest Nights by Region (Monthly)"""
     logger.info("Processing guest nights data...")
     
-    df = read_csv_robust(file_path)
-    
-    # Extract headers from rows 1 and 2 (regions and metrics)
-    header_regions = df.iloc[1].values  # Regional headers
-    header_metrics = df.iloc[2].values  # Metric headers
-    
-    # Get data starting from row 3
-    data_rows = df.iloc[3:].reset_index(drop=True)
-    
-    # Extract region and metric mappings
-    regions, metrics = extract_region_columns(header_regions, header_metrics)
+    result_df = read_csv_robust(file_path).pipe(reshape_regional_table, 'Stats NZ ACS348801', 'Guest Nights by Region (Monthly)')
     
-    processed_data = []
-    
-    for _, row in data_rows.iterrows():
-        period_str = str(row.iloc[0]).strip()
-        report_date = parse_period_to_date(period_str)
-        
-        if report_date is None:
-            continue
-        
-        # Process each data column
-        for i, (region, metric) in enumerate(zip(regions, metrics)):
-            if i + 1 >= len(row):  # Skip if no data column
-                continue
-                
-            value = pd.to_numeric(row.iloc[i + 1], errors='coerce')
-            
-            if pd.notna(value) and region != 'Unknown':
-                processed_data.append({
-                    'report_date': report_date,
-                    'period_type': 'Monthly',
-                    'region': region,
-                    'metric_type': metric,
-                    'value': float(value),
-                    'data_source': 'Stats NZ ACS348801',
-                    'dataset_description': 'Guest Nights by Region (Monthly)',
-                    'load_timestamp': datetime.now()
-                })
-    
-    result_df = pd.DataFrame(processed_data)
-    
-    # Pivot to create separate columns for different metrics
-    if len(result_df) > 0:
-        result_df = result_df.pivot_table(
-            index=['report_date', 'period_type', 'region', 'data_source', 'dataset_description', 'load_timestamp'],
-            columns='metric_type',
-            values='value',
-            aggfunc='first'
-        ).reset_index()
-        
-        # Flatten column names
-        result_df.columns.name = None
-        
     logger.info(f"Processed {len(result_df)} guest nights records")
     return result_df
 
@@ -218,66 +207,15 @@ def process_occupancy_rates(file_path):
     """Process ACS348401 - Occupancy Rate by Region (Monthly)"""
     logger.info("Processing occupancy rates data...")
     
-    df = read_csv_robust(file_path)
-    
-    # Extract headers from rows 1 and 2 (regions and metrics)
-    header_regions = df.iloc[1].values
-    header_metrics = df.iloc[2].values
-    
-    # Get data starting from row 3
-    data_rows = df.iloc[3:].reset_index(drop=True)
-    
-    # Extract region and metric mappings
-    regions, metrics = extract_region_columns(header_regions, header_metrics)
+    result_df = read_csv_robust(file_path).pipe(reshape_regional_table, 'Stats NZ ACS348401', 'Occupancy Rate by Region (Monthly)')
     
-    processed_data = []
-    
-    for _, row in data_rows.iterrows():
-        period_str = str(row.iloc[0]).strip()
-        report_date = parse_period_to_date(period_str)
-        
-        if report_date is None:
-            continue
-        
-        # Process each data column
-        for i, (region, metric) in enumerate(zip(regions, metrics)):
-            if i + 1 >= len(row):
-                continue
-                
-            value = pd.to_numeric(row.iloc[i + 1], errors='coerce')
-            
-            if pd.notna(value) and region != 'Unknown':
-                processed_data.append({
-                    'report_date': report_date,
-                    'period_type': 'Monthly',
-                    'region': region,
-                    'metric_type': metric,
-                    'value': float(value),
-                    'data_source': 'Stats NZ ACS348401',
-                    'dataset_description': 'Occupancy Rate by Region (Monthly)',
-                    'load_timestamp': datetime.now()
-                })
-    
-    result_df = pd.DataFrame(processed_data)
-    
-    # Pivot to create separate columns for different metrics
-    if len(result_df) > 0:
-        result_df = result_df.pivot_table(
-            index=['report_date', 'period_type', 'region', 'data_source', 'dataset_description', 'load_timestamp'],
-            columns='metric_type',
-            values='value',
-            aggfunc='first'
-        ).reset_index()
-        
-        # Flatten column names
-        result_df.columns.name = None
-        
     logger.info(f"Processed {len(result_df)} occupancy rate records")
     return result_df
 
 def process_migrant_arrivals(file_path):
     """Process ITM553006 - Estimated migrant arrivals (simplified version)"""
     logger.info("Processing migrant arrivals data...")
+    load_timestamp = datetime.now()
     
     df = read_csv_robust(file_path)
     
@@ -285,34 +223,31 @@ def process_migrant_arrivals(file_path):
     # TODO: Full implementation would parse all visa types and countries
     
     # Look for total columns (usually at the end)
-    data_rows = df.iloc[6:].reset_index(drop=True)  # Skip complex headers
-    
-    processed_data = []
-    
-    for _, row in data_rows.iterrows():
-        try:
-            year = int(row.iloc[0])
-            if 2000 <= year <= 2100:  # Focus on recent data
-                # Look for total columns - usually the last meaningful data
-                row_values = row.iloc[1:].values
-                # Find the last non-null numeric value as total
-                for val in reversed(row_values):
-                    total_estimate = pd.to_numeric(val, errors='coerce')
-                    if pd.notna(total_estimate) and total_estimate > 0:
-                        processed_data.append({
-                            'report_year': year,
-                            'report_date': pd.to_datetime(f"{year}-04-30"),  # Annual-Apr
-                            'period_type': 'Annual',
-                            'total_migrant_arrivals': int(total_estimate),
-                            'data_source': 'Stats NZ ITM553006',
-                            'dataset_description': 'Estimated migrant arrivals by citizenship, visa type (Total)',
-                            'load_timestamp': datetime.now()
-                        })
-                        break
-        except (ValueError, TypeError):
-            continue
+    data_rows = df.iloc[6:]  # Skip complex headers
+    
+    years, in_range = parse_year_column(data_rows.iloc[:, 0], 2000, 2100)  # Focus on recent data
+    data_rows = data_rows[in_range.to_numpy()]
+    years = years[in_range].astype('int16')
+    
+    # The total is the last positive numeric value in each row; argmax over the reversed mask finds it
+    estimates = data_rows.iloc[:, 1:].apply(pd.to_numeric, errors='coerce').to_numpy(dtype='float64')
+    is_positive = estimates > 0
+    last_positive = estimates.shape[1] - 1 - np.argmax(is_positive[:, ::-1], axis=1)
+    has_total = is_positive.any(axis=1)
+    total_estimates = pd.Series(estimates[np.flatnonzero(has_total), last_positive[has_total]])
+    years = years[has_total]
+    
+    processed_data = {
+        'report_year': years,
+        'report_date': annual_report_dates(years, '04-30'),  # Annual-Apr
+        'period_type': 'Annual',
+        'total_migrant_arrivals': whole_counts(total_estimates).to_numpy(),
+        'data_source': 'Stats NZ ITM553006',
+        'dataset_description': 'Estimated migrant arrivals by citizenship, visa type (Total)'
+    }
     
-    result_df = pd.DataFrame(processed_data)
+    result_df = pd.DataFrame(processed_data).reset_index(drop=True)
+    result_df['load_timestamp'] = load_timestamp
     logger.info(f"Processed {len(result_df)} migrant arrival records")
     return result_df
 
@@ -321,26 +256,9 @@ def clean_region_names(df, region_column='region'):
     if region_column not in df.columns:
         return df
     
-    region_mapping = {
-        'Auckland': 'Auckland',
-        'Wellington': 'Wellington',
-        'Canterbury': 'Canterbury',
-        'Waikato': 'Waikato',
-        'Bay of Plenty': 'Bay of Plenty',
-        'Hawke\'s Bay, Gisborne': 'Hawke\'s Bay',
-        'Taranaki, Manawatu, Wanganui': 'Taranaki-Manawatu-Whanganui',
-        'Nelson, Marlborough, Tasman': 'Tasman-Nelson-Marlborough',
-        'West Coast': 'West Coast',
-        'Otago': 'Otago',
-        'Southland': 'Southland',
-        'Northland': 'Northland',
-        'North Island': 'North Island',
-        'South Island': 'South Island',
-        'New Zealand': 'New Zealand'
-    }
-    
-    # Apply mapping with fallback to original value
-    df[region_column] = df[region_column].map(region_mapping).fillna(df[region_column])
+    # Map the handful of distinct names once via categories, keeping names with no mapping as they are
+    region_names = df[region_column].astype('category')
+    df[region_column] = region_names.map(lambda name: REGION_NAME_MAP.get(name, name))
     
     return df
 
@@ -358,7 +276,7 @@ def save_processed_data(df, filename, description):
         output_path = output_dir / filename
         
         # Save to CSV with date formatting
-        df.to_csv(output_path, index=False, date_format='%Y-%m-%d')
+        write_csv(df, output_path, date_format='%Y-%m-%d')
         
         logger.info(f"Saved {len(df)} {description} records to {output_path}")
         
@@ -407,12 +325,8 @@ def main():
         try:
             logger.info(f"Processing {input_file}...")
             
-            # Process the data
-            df = processor_func(input_path)
-            
-            # Clean region names if applicable
-            if 'region' in df.columns:
-                df = clean_region_names(df)
+            # Process the data and clean region names if applicable
+            df = processor_func(input_path).pipe(clean_region_names)
             
             # Save processed data
             output_path = save_processed_data(df, output_file, description)
@@ -19,11 +19,72 @@ import logging
 import zipfile
 import json
 import re
+import calendar
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import datetime
+from functools import partial
+
+from _csv_output import write_csv
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Lower-cased full month names -> month number, matching strptime('%B') case-insensitively
+MONTH_NUMBERS = {name.lower(): number for number, name in enumerate(calendar.month_name) if name}
+
+# NIWA station archives are named <station>_Rain.zip / <station>_Temperature.zip
+NIWA_ZIP_SUFFIXES = ('_Rain', '_Temperature')
+_NIWA_STATION_RE = re.compile(r'(\d+)_')
+
+# NIWA station CSVs are PERIOD,YEAR,STATS_VALUE; only these are read, with fixed dtypes to skip inference and keep the year narrow
+NIWA_STATS_DTYPES = {'PERIOD': 'str', 'YEAR': 'Int16', 'STATS_VALUE': 'float64'}
+
+# How many list levels sit above the positions in each GeoJSON geometry type
+_GEOJSON_NESTING = {
+    'Point': 0, 'LineString': 1, 'MultiPoint': 1, 'Polygon': 2, 'MultiLineString': 2, 'MultiPolygon': 3
+}
+
+# Zip members are named <station>__<period>__<statistic>__<units>.csv
+_NIWA_MEMBER_RE = re.compile(r'\d+__(annual|monthly|combined)__(.+?)__.*\.csv$')
+
+# (zip type, period, statistic) -> output column; members not listed here are not loaded
+NIWA_METRIC_COLUMNS = {
+    ('rain', 'annual', 'Total_rainfall'): 'total_rainfall_mm',
+    ('rain', 'monthly', 'Total_rainfall'): 'total_rainfall_mm',
+    ('rain', 'annual', 'Rain_Days'): 'rain_days_count',
+    ('rain', 'monthly', 'Rain_Days'): 'rain_days_count',
+    ('rain', 'annual', 'Total_Runoff'): 'total_runoff_mm',
+    ('rain', 'monthly', 'Total_Runoff'): 'total_runoff_mm',
+    ('rain', 'annual', 'Total_Deficit'): 'total_deficit_mm',
+    ('rain', 'monthly', 'Total_Deficit'): 'total_deficit_mm',
+    ('temperature', 'annual', 'Mean_air_temperature'): 'mean_temperature_c',
+    ('temperature', 'monthly', 'Mean_air_temperature'): 'mean_temperature_c',
+    ('temperature', 'annual', 'Mean_daily_maximum_air_temperature'): 'mean_max_temperature_c',
+    ('temperature', 'annual', 'Mean_daily_minimum_air_temperature'): 'mean_min_temperature_c'
+}
+
+# Keywords that mark an ICNZ event as water-related, matched in the event name or categories
+WATER_RELATED_KEYWORDS = ['flood', 'storm', 'rain', 'cyclone', 'water']
+_WATER_RELATED_RE = re.compile('|'.join(WATER_RELATED_KEYWORDS), re.IGNORECASE)
+
+def count_coordinates(geometry: dict) -> int:
+    """Count every vertex in a GeoJSON geometry, across all rings and parts"""
+    if geometry['type'] == 'GeometryCollection':
+        return sum(count_coordinates(part) for part in geometry['geometries'])
+    
+    coordinates = geometry['coordinates']
+    depth = _GEOJSON_NESTING.get(geometry['type'])
+    if depth == 0:
+        return 1
+    if depth == 1:
+        return len(coordinates)
+    if depth == 2:
+        return sum(map(len, coordinates))
+    if depth == 3:
+        return sum(len(ring) for polygon in coordinates for ring in polygon)
+    return 0
+
 def process_waipa_flood_data(data_dir: Path, processed_dir: Path):
     """Process Waipa District flood zone data from Waikato Regional Hazards Portal"""
     logger.info("🗺️  Processing Waipa District flood zone data...")
@@ -36,9 +97,12 @@ def process_waipa_flood_data(data_dir: Path, processed_dir: Path):
         logger.warning("No Waipa flood data files found")
         return None, None
     
+    # One load timestamp for both flood tables
+    load_timestamp = datetime.now()
+    
     # Process CSV metadata
     df_flood_zones = pd.read_csv(flood_csv_files[0])
-    df_flood_zones['load_timestamp'] = datetime.now()
+    df_flood_zones['load_timestamp'] = load_timestamp
     df_flood_zones['data_source'] = 'Waikato Regional Hazards Portal'
     df_flood_zones['source_url'] = 'https://www.waikatoregion.govt.nz/services/regional-hazards-and-emergency-management/regional-hazards-portal/'
     
@@ -49,31 +113,29 @@ def process_waipa_flood_data(data_dir: Path, processed_dir: Path):
     })
     
     output_file = processed_dir / "waipa_flood_zones.csv"
-    df_flood_zones.to_csv(output_file, index=False)
+    write_csv(df_flood_zones, output_file)
     logger.info(f"✅ Processed flood zones: {output_file} ({len(df_flood_zones)} zones)")
     
     # Process GeoJSON boundaries (extract key properties for simplified table)
     with open(flood_geojson_files[0], 'r') as f:
         geojson_data = json.load(f)
     
-    boundaries_data = []
-    for feature in geojson_data['features']:
-        properties = feature['properties']
-        geometry = feature['geometry']
-        
-        boundaries_data.append({
-            'fid': properties.get('FID'),
-            'flood_zone_id': properties.get('id'),
-            'geometry_type': geometry['type'],
-            'coordinate_count': len(geometry['coordinates'][0]) if geometry['type'] == 'Polygon' else 0,
-            'geometry_json': json.dumps(geometry),
-            'load_timestamp': datetime.now(),
-            'data_source': 'Waikato Regional Hazards Portal'
-        })
-    
-    df_boundaries = pd.DataFrame(boundaries_data)
+    # Build each column with one comprehension instead of a dict per feature
+    features = geojson_data['features']
+    properties = [feature['properties'] for feature in features]
+    geometries = [feature['geometry'] for feature in features]
+    
+    df_boundaries = pd.DataFrame({
+        'fid': [props.get('FID') for props in properties],
+        'flood_zone_id': [props.get('id') for props in properties],
+        'geometry_type': [geometry['type'] for geometry in geometries],
+        'coordinate_count': [count_coordinates(geometry) for geometry in geometries],
+        'geometry_json': [json.dumps(geometry, separators=(',', ':')) for geometry in geometries],
+        'load_timestamp': load_timestamp,
+        'data_source': 'Waikato Regional Hazards Portal'
+    })
     boundaries_output = processed_dir / "waipa_flood_boundaries.csv"
-    df_boundaries.to_csv(boundaries_output, index=False)
+    write_csv(df_boundaries, boundaries_output)
     logger.info(f"✅ Processed flood boundaries: {boundaries_output} ({len(df_boundaries)} polygons)")
     
     return output_file, boundaries_output
@@ -95,17 +157,16 @@ def process_icnz_disaster_costs(data_dir: Path, processed_dir: Path):
         'Inflation adjusted cost ($m)': 'inflation_adjusted_cost_millions_nzd'
     })
     
-    # Parse dates
-    df_costs['event_date'] = pd.to_datetime(df_costs['Date'], errors='coerce')
+    # Parse dates; ICNZ leads with '2025 Jan 26', and ranges like '2024 Oct 1-4' fall out as NaT
+    df_costs['event_date'] = pd.to_datetime(df_costs['Date'], format='%Y %b %d', errors='coerce')
     df_costs['event_year'] = df_costs['event_date'].dt.year
     
     # Extract event type from Categories
     df_costs['primary_category'] = df_costs['Categories'].fillna('').str.split(',').str[0].str.strip()
     
-    # Classify water-related disasters
-    water_related_keywords = ['flood', 'storm', 'rain', 'cyclone', 'water']
-    df_costs['is_water_related'] = df_costs['Event'].str.lower().str.contains('|'.join(water_related_keywords), na=False) | \
-                                   df_costs['Categories'].str.lower().str.contains('|'.join(water_related_keywords), na=False)
+    # Classify water-related disasters; one scan over event and categories joined by a separator
+    event_text = df_costs['Event'].fillna('') + '|' + df_costs['Categories'].fillna('')
+    df_costs['is_water_related'] = event_text.str.contains(_WATER_RELATED_RE)
     
     # Add metadata
     df_costs['load_timestamp'] = datetime.now()
@@ -127,7 +188,7 @@ def process_icnz_disaster_costs(data_dir: Path, processed_dir: Path):
     df_final = df_final[df_final['cost_millions_nzd'].notna()]
     
     output_file = processed_dir / "icnz_disaster_costs.csv"
-    df_final.to_csv(output_file, index=False)
+    write_csv(df_final, output_file)
     
     water_related_count = df_final['is_water_related'].sum()
     total_water_cost = pd.to_numeric(df_final[df_final['is_water_related']]['inflation_adjusted_cost_millions_nzd'], errors='coerce').sum()
@@ -138,78 +199,79 @@ def process_icnz_disaster_costs(data_dir: Path, processed_dir: Path):
     
     return output_file
 
+def spread_station_metrics(combined: pd.DataFrame, index_cols: list) -> pd.DataFrame:
+    """Spread metric-tagged station rows into one column per metric, keeping the first value per key"""
+    spread = combined.groupby(index_cols + ['metric'])['STATS_VALUE'].first().unstack('metric')
+    
+    # Keys with no value for any metric are dropped, as pivot_table did
+    spread = spread.dropna(how='all').reset_index()
+    spread.columns.name = None
+    return spread
+
+def parse_station_zip(zip_file: Path, load_ts: datetime) -> dict:
+    """Read the mapped statistics from one NIWA station zip, keyed by (zip type, period)"""
+    station_id = int(_NIWA_STATION_RE.match(zip_file.name).group(1))
+    station_name = f"NIWA Station {station_id}"
+    data_type = 'rain' if 'Rain' in zip_file.name else 'temperature'
+    logger.info(f"Processing Station {station_id} - {data_type} data")
+    
+    station_frames = {}
+    with zipfile.ZipFile(zip_file, 'r') as zf:
+        for member in zf.namelist():
+            # Look the member up before reading it; statistics with no table column are skipped unread
+            member_match = _NIWA_MEMBER_RE.match(member)
+            if not member_match:
+                continue
+            period, statistic = member_match.groups()
+            metric = NIWA_METRIC_COLUMNS.get((data_type, period, statistic))
+            if metric is None:
+                continue
+            
+            with zf.open(member) as f:
+                df = pd.read_csv(f, usecols=list(NIWA_STATS_DTYPES), dtype=NIWA_STATS_DTYPES)
+            
+            # Add common columns
+            df['station_id'] = station_id
+            df['station_name'] = station_name
+            df['load_timestamp'] = load_ts
+            station_frames.setdefault((data_type, period), []).append(df.assign(metric=metric))
+    
+    return station_frames
+
 def process_niwa_climate_data(data_dir: Path, processed_dir: Path):
     """Process NIWA climate data (using existing logic)"""
     logger.info("🌧️  Processing NIWA climate data...")
     
-    zip_files = list(data_dir.glob('*_Rain.zip')) + list(data_dir.glob('*_Temperature.zip'))
+    # One directory scan, keeping only the station rain and temperature archives
+    zip_files = [path for path in data_dir.glob('*.zip') if path.stem.endswith(NIWA_ZIP_SUFFIXES)]
     if not zip_files:
         logger.warning("No NIWA climate zip files found")
         return []
     
     logger.info(f"Found {len(zip_files)} NIWA climate data files")
 
+    # One load timestamp for every table written in this run
+    load_ts = datetime.now()
+
     all_annual_rainfall_data = []
     all_monthly_rainfall_data = []
     all_annual_temperature_data = []
     all_monthly_temperature_data = []
+    metric_frames = {
+        ('rain', 'annual'): all_annual_rainfall_data,
+        ('rain', 'monthly'): all_monthly_rainfall_data,
+        ('temperature', 'annual'): all_annual_temperature_data,
+        ('temperature', 'monthly'): all_monthly_temperature_data
+    }
 
-    for zip_file in zip_files:
-        station_id = int(re.search(r'(\d+)_', zip_file.name).group(1))
-        station_name = f"NIWA Station {station_id}"
-        data_type = 'rain' if 'Rain' in zip_file.name else 'temperature'
-        logger.info(f"Processing Station {station_id} - {data_type} data")
-
-        with zipfile.ZipFile(zip_file, 'r') as zf:
-            for member in zf.namelist():
-                if member.endswith('.csv'):
-                    with zf.open(member) as f:
-                        df = pd.read_csv(f)
-                        
-                        # Add common columns
-                        df['station_id'] = station_id
-                        df['station_name'] = station_name
-                        df['load_timestamp'] = datetime.now()
-
-                        if data_type == 'rain':
-                            if '__annual__' in member and 'Total_rainfall' in member:
-                                df = df.rename(columns={'STATS_VALUE': 'total_rainfall_mm'})
-                                all_annual_rainfall_data.append(df)
-                            elif '__monthly__' in member and 'Total_rainfall' in member:
-                                df = df.rename(columns={'STATS_VALUE': 'total_rainfall_mm'})
-                                all_monthly_rainfall_data.append(df)
-                            elif '__annual__' in member and 'Rain_Days' in member:
-                                df = df.rename(columns={'STATS_VALUE': 'rain_days_count'})
-                                # Merge with existing annual data or create new entries
-                                all_annual_rainfall_data.append(df)
-                            elif '__monthly__' in member and 'Rain_Days' in member:
-                                df = df.rename(columns={'STATS_VALUE': 'rain_days_count'})
-                                all_monthly_rainfall_data.append(df)
-                            elif '__annual__' in member and 'Total_Runoff' in member:
-                                df = df.rename(columns={'STATS_VALUE': 'total_runoff_mm'})
-                                all_annual_rainfall_data.append(df)
-                            elif '__monthly__' in member and 'Total_Runoff' in member:
-                                df = df.rename(columns={'STATS_VALUE': 'total_runoff_mm'})
-                                all_monthly_rainfall_data.append(df)
-                            elif '__annual__' in member and 'Total_Deficit' in member:
-                                df = df.rename(columns={'STATS_VALUE': 'total_deficit_mm'})
-                                all_annual_rainfall_data.append(df)
-                            elif '__monthly__' in member and 'Total_Deficit' in member:
-                                df = df.rename(columns={'STATS_VALUE': 'total_deficit_mm'})
-                                all_monthly_rainfall_data.append(df)
-                        elif data_type == 'temperature':
-                            if '__annual__' in member and 'Mean_Air_Temperature' in member:
-                                df = df.rename(columns={'STATS_VALUE': 'mean_temperature_c'})
-                                all_annual_temperature_data.append(df)
-                            elif '__monthly__' in member and 'Mean_Air_Temperature' in member:
-                                df = df.rename(columns={'STATS_VALUE': 'mean_temperature_c'})
-                                all_monthly_temperature_data.append(df)
-                            elif '__annual__' in member and 'Mean_daily_maximum_air_temperature' in member:
-                                df = df.rename(columns={'STATS_VALUE': 'mean_max_temperature_c'})
-                                all_annual_temperature_data.append(df)
-                            elif '__annual__' in member and 'Mean_daily_minimum_air_temperature' in member:
-                                df = df.rename(columns={'STATS_VALUE': 'mean_min_temperature_c'})
-                                all_annual_temperature_data.append(df)
+    # Each zip is read independently, so fan them out and gather the tagged frames per table;
+    # main() runs this on a worker thread, and forking a process with live threads can deadlock,
+    # so the pool spawns fresh interpreters instead
+    worker = partial(parse_station_zip, load_ts=load_ts)
+    with ProcessPoolExecutor(mp_context=multiprocessing.get_context('spawn')) as executor:
+        for station_frames in executor.map(worker, zip_files):
+            for table_key, frames in station_frames.items():
+                metric_frames[table_key].extend(frames)
 
     logger.info("Creating combined CSV files for Snowflake...")
     output_files = []
@@ -217,74 +279,55 @@ def process_niwa_climate_data(data_dir: Path, processed_dir: Path):
     # Combine and save annual rainfall
     if all_annual_rainfall_data:
         df_annual_rainfall = pd.concat(all_annual_rainfall_data, ignore_index=True)
-        df_annual_rainfall = df_annual_rainfall.pivot_table(
-            index=['YEAR', 'station_id', 'station_name', 'load_timestamp'],
-            values=['total_rainfall_mm', 'rain_days_count', 'total_runoff_mm', 'total_deficit_mm'],
-            aggfunc='first'
-        ).reset_index()
-        df_annual_rainfall.columns.name = None
+        df_annual_rainfall = spread_station_metrics(df_annual_rainfall, ['YEAR', 'station_id', 'station_name', 'load_timestamp'])
         df_annual_rainfall = df_annual_rainfall.rename(columns={'YEAR': 'year'})
         
         output_file = processed_dir / "rainfall_annual_combined.csv"
-        df_annual_rainfall.to_csv(output_file, index=False)
+        write_csv(df_annual_rainfall, output_file)
         output_files.append(output_file)
         logger.info(f"✅ Created rainfall_annual_combined.csv ({len(df_annual_rainfall)} records)")
 
     # Combine and save monthly rainfall
     if all_monthly_rainfall_data:
         df_monthly_rainfall = pd.concat(all_monthly_rainfall_data, ignore_index=True)
-        df_monthly_rainfall['month_number'] = df_monthly_rainfall['PERIOD'].apply(
-            lambda x: datetime.strptime(x, '%B').month if isinstance(x, str) else None)
-        df_monthly_rainfall = df_monthly_rainfall.pivot_table(
-            index=['PERIOD', 'YEAR', 'station_id', 'station_name', 'load_timestamp', 'month_number'],
-            values=['total_rainfall_mm', 'rain_days_count', 'total_runoff_mm', 'total_deficit_mm'],
-            aggfunc='first'
-        ).reset_index()
-        df_monthly_rainfall.columns.name = None
+        df_monthly_rainfall['month_number'] = df_monthly_rainfall['PERIOD'].str.lower().map(MONTH_NUMBERS).astype('Int8')
+        df_monthly_rainfall = spread_station_metrics(
+            df_monthly_rainfall, ['PERIOD', 'YEAR', 'station_id', 'station_name', 'load_timestamp', 'month_number']
+        )
         df_monthly_rainfall = df_monthly_rainfall.rename(columns={'PERIOD': 'month_name', 'YEAR': 'year'})
         
         output_file = processed_dir / "rainfall_monthly_combined.csv"
-        df_monthly_rainfall.to_csv(output_file, index=False)
+        write_csv(df_monthly_rainfall, output_file)
         output_files.append(output_file)
         logger.info(f"✅ Created rainfall_monthly_combined.csv ({len(df_monthly_rainfall)} records)")
 
     # Combine and save annual temperature
     if all_annual_temperature_data:
         df_annual_temperature = pd.concat(all_annual_temperature_data, ignore_index=True)
-        df_annual_temperature = df_annual_temperature.pivot_table(
-            index=['YEAR', 'station_id', 'station_name', 'load_timestamp'],
-            values=['mean_temperature_c', 'mean_max_temperature_c', 'mean_min_temperature_c'],
-            aggfunc='first'
-        ).reset_index()
-        df_annual_temperature.columns.name = None
+        df_annual_temperature = spread_station_metrics(df_annual_temperature, ['YEAR', 'station_id', 'station_name', 'load_timestamp'])
         df_annual_temperature = df_annual_temperature.rename(columns={'YEAR': 'year'})
         
         output_file = processed_dir / "temperature_annual_combined.csv"
-        df_annual_temperature.to_csv(output_file, index=False)
+        write_csv(df_annual_temperature, output_file)
         output_files.append(output_file)
         logger.info(f"✅ Created temperature_annual_combined.csv ({len(df_annual_temperature)} records)")
 
     # Combine and save monthly temperature  
     if all_monthly_temperature_data:
         df_monthly_temperature = pd.concat(all_monthly_temperature_data, ignore_index=True)
-        df_monthly_temperature['month_number'] = df_monthly_temperature['PERIOD'].apply(
-            lambda x: datetime.strptime(x, '%B').month if isinstance(x, str) else None)
+        df_monthly_temperature['month_number'] = df_monthly_temperature['PERIOD'].str.lower().map(MONTH_NUMBERS).astype('Int8')
         
-        # Get available temperature columns
-        available_temp_cols = [col for col in ['mean_temperature_c', 'mean_max_temperature_c', 'mean_min_temperature_c'] 
-                              if col in df_monthly_temperature.columns]
+        # Get available temperature metrics
+        available_temp_cols = df_monthly_temperature['metric'].dropna().unique()
         
-        if available_temp_cols:
-            df_monthly_temperature = df_monthly_temperature.pivot_table(
-                index=['PERIOD', 'YEAR', 'station_id', 'station_name', 'load_timestamp', 'month_number'],
-                values=available_temp_cols,
-                aggfunc='first'
-            ).reset_index()
-            df_monthly_temperature.columns.name = None
+        if len(available_temp_cols):
+            df_monthly_temperature = spread_station_metrics(
+                df_monthly_temperature, ['PERIOD', 'YEAR', 'station_id', 'station_name', 'load_timestamp', 'month_number']
+            )
             df_monthly_temperature = df_monthly_temperature.rename(columns={'PERIOD': 'month_name', 'YEAR': 'year'})
             
             output_file = processed_dir / "temperature_monthly_combined.csv"
-            df_monthly_temperature.to_csv(output_file, index=False)
+            write_csv(df_monthly_temperature, output_file)
             output_files.append(output_file)
             logger.info(f"✅ Created temperature_monthly_combined.csv ({len(df_monthly_temperature)} records)")
         else:
@@ -303,18 +346,25 @@ def main():
     
     all_outputs = []
     
+    # The three sources read and write disjoint files, so run them side by side;
+    # NIWA already fans its zips out to spawned worker processes, so threads are enough here
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        flood_future = executor.submit(process_waipa_flood_data, data_dir, processed_dir)
+        cost_future = executor.submit(process_icnz_disaster_costs, data_dir, processed_dir)
+        climate_future = executor.submit(process_niwa_climate_data, data_dir, processed_dir)
+    
     # Process Waipa flood data
-    flood_outputs = process_waipa_flood_data(data_dir, processed_dir)
+    flood_outputs = flood_future.result()
     if flood_outputs[0]:
         all_outputs.extend([f for f in flood_outputs if f])
     
     # Process ICNZ disaster costs
-    cost_output = process_icnz_disaster_costs(data_dir, processed_dir)
+    cost_output = cost_future.result()
     if cost_output:
         all_outputs.append(cost_output)
     
     # Process NIWA climate data
-    climate_outputs = process_niwa_climate_data(data_dir, processed_dir)
+    climate_outputs = climate_future.result()
     all_outputs.extend(climate_outputs)
     
     logger.info("=" * 60)
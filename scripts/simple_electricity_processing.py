@@ -9,6 +9,9 @@ from pathlib import Path
 import logging
 from datetime import datetime
 
+from _column_names import clean_column_names
+from _csv_output import write_csv
+
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -19,7 +22,7 @@ def setup_directories():
     processed_dir.mkdir(exist_ok=True)
     return processed_dir
 
-def process_zone_data_final(file_path: str, output_dir: Path):
+def process_zone_data_final(file_path: str, output_dir: Path, load_ts: datetime):
     """Process 5-minute zone data - our main dataset"""
     logger.info(f"Processing zone data: {file_path}")
     
@@ -27,15 +30,14 @@ def process_zone_data_final(file_path: str, output_dir: Path):
     logger.info(f"Original data: {len(df)} rows, {len(df.columns)} columns")
     
     # Clean column names - remove spaces and special characters
-    df.columns = [col.strip().replace(' ', '_').replace('(', '').replace(')', '').upper() 
-                 for col in df.columns]
+    df.columns = clean_column_names(df.columns)
     
-    # Convert date column
-    df['DATE'] = pd.to_datetime(df['DATE'])
+    # Convert date column (EMI zone exports use '01 Jul 2025 00:05')
+    df['DATE'] = pd.to_datetime(df['DATE'], format='%d %b %Y %H:%M')
     df = df.rename(columns={'DATE': 'TIMESTAMP_NZ'})
     
     # Add metadata
-    df['LOAD_TIMESTAMP'] = datetime.now()
+    df['LOAD_TIMESTAMP'] = load_ts
     
     # Show data info
     logger.info(f"Processed columns: {list(df.columns)}")
@@ -44,12 +46,12 @@ def process_zone_data_final(file_path: str, output_dir: Path):
     
     # Save final file
     output_file = output_dir / "electricity_zone_data_5min_final.csv"
-    df.to_csv(output_file, index=False)
+    write_csv(df, output_file)
     logger.info(f"Saved {len(df)} rows to {output_file}")
     
-    return output_file
+    return output_file, len(df), list(df.columns)
 
-def create_sample_fuel_data(output_dir: Path):
+def create_sample_fuel_data(output_dir: Path, load_ts: datetime):
     """Create sample fuel type data for demonstration"""
     logger.info("Creating sample fuel type data...")
     
@@ -68,27 +70,33 @@ def create_sample_fuel_data(output_dir: Path):
     renewable_cols = ['HYDRO_GWH', 'GEOTHERMAL_GWH', 'WIND_GWH', 'SOLAR_PV_GWH']
     fossil_cols = ['OIL_GWH', 'COAL_GWH', 'GAS_GWH']
     
-    df['RENEWABLE_GWH'] = df[renewable_cols].sum(axis=1)
-    df['FOSSIL_FUEL_GWH'] = df[fossil_cols].sum(axis=1) 
-    df['TOTAL_GENERATION_GWH'] = df['RENEWABLE_GWH'] + df['FOSSIL_FUEL_GWH']
+    # Pull the fuel columns into one block and work on array slices of it
+    fuel = df[renewable_cols + fossil_cols].to_numpy()
+    renewable = fuel[:, :len(renewable_cols)].sum(axis=1)
+    fossil = fuel[:, len(renewable_cols):].sum(axis=1)
+    total = renewable + fossil
+    
+    df['RENEWABLE_GWH'] = renewable
+    df['FOSSIL_FUEL_GWH'] = fossil
+    df['TOTAL_GENERATION_GWH'] = total
     
-    df['RENEWABLE_PERCENTAGE'] = (df['RENEWABLE_GWH'] / df['TOTAL_GENERATION_GWH'] * 100).round(2)
-    df['FOSSIL_FUEL_PERCENTAGE'] = (df['FOSSIL_FUEL_GWH'] / df['TOTAL_GENERATION_GWH'] * 100).round(2)
+    df['RENEWABLE_PERCENTAGE'] = (renewable / total * 100).round(2)
+    df['FOSSIL_FUEL_PERCENTAGE'] = (fossil / total * 100).round(2)
     
     # Add other columns to match expected schema
     df['BIOGAS_GWH'] = 100  # Small constant for now
     df['ELECTRICITY_ONLY_SUBTOTAL_GWH'] = df['TOTAL_GENERATION_GWH'] * 0.9
     df['COGENERATION_GWH'] = df['TOTAL_GENERATION_GWH'] * 0.1
     df['SOURCE_SHEET'] = 'Sample Data'
-    df['LOAD_TIMESTAMP'] = datetime.now()
+    df['LOAD_TIMESTAMP'] = load_ts
     
     output_file = output_dir / "electricity_generation_by_fuel_final.csv"
-    df.to_csv(output_file, index=False)
+    write_csv(df, output_file)
     logger.info(f"Created sample fuel data: {len(df)} rows saved to {output_file}")
     
-    return output_file
+    return output_file, len(df), list(df.columns)
 
-def create_sample_quarterly_data(output_dir: Path):
+def create_sample_quarterly_data(output_dir: Path, load_ts: datetime):
     """Create sample quarterly data for demonstration"""
     logger.info("Creating sample quarterly data...")
     
@@ -108,7 +116,7 @@ def create_sample_quarterly_data(output_dir: Path):
                 'QUARTER_YEAR': year,
                 'QUARTER_NUMBER': quarter,
                 'SOURCE_SHEET': 'Sample Data',
-                'LOAD_TIMESTAMP': datetime.now()
+                'LOAD_TIMESTAMP': load_ts
             })
     
     df = pd.DataFrame(quarters)
@@ -120,10 +128,10 @@ def create_sample_quarterly_data(output_dir: Path):
     ).round(4)
     
     output_file = output_dir / "electricity_quarterly_generation_final.csv"
-    df.to_csv(output_file, index=False)
+    write_csv(df, output_file)
     logger.info(f"Created sample quarterly data: {len(df)} rows saved to {output_file}")
     
-    return output_file
+    return output_file, len(df), list(df.columns)
 
 def main():
     """Main processing function"""
@@ -132,38 +140,38 @@ def main():
         logger.info("Starting simple electricity data processing...")
         logger.info("Focus: High-quality zone data + sample tables for other themes")
         
+        # One load timestamp shared by every table written in this run
+        load_ts = datetime.now()
+        
         generated_files = []
         
         # 1. Process the real zone data (our primary dataset)
         csv_path = "data/Zone Data (01 Jul - 29 Jul) [5 intervals] (1).csv"
         if Path(csv_path).exists():
-            zone_file = process_zone_data_final(csv_path, output_dir)
-            generated_files.append(zone_file)
+            zone_summary = process_zone_data_final(csv_path, output_dir, load_ts)
+            generated_files.append(zone_summary)
         else:
             logger.error(f"Zone data file not found: {csv_path}")
         
         # 2. Create sample fuel type data (participants can enhance this)
-        fuel_file = create_sample_fuel_data(output_dir)
-        generated_files.append(fuel_file)
+        fuel_summary = create_sample_fuel_data(output_dir, load_ts)
+        generated_files.append(fuel_summary)
         
         # 3. Create sample quarterly data (participants can enhance this)
-        quarterly_file = create_sample_quarterly_data(output_dir)
-        generated_files.append(quarterly_file)
+        quarterly_summary = create_sample_quarterly_data(output_dir, load_ts)
+        generated_files.append(quarterly_summary)
         
-        # Summary
+        # Summary, from the row counts and columns captured as each file was written
         logger.info(f"\n🎉 Processing complete! Generated {len(generated_files)} files:")
-        for file in generated_files:
+        for file, row_count, columns in generated_files:
             logger.info(f"✅ {file.name}")
-            
-            # Show sample of each file
-            df_sample = pd.read_csv(file, nrows=2)
-            logger.info(f"   Columns ({len(df_sample.columns)}): {list(df_sample.columns)[:5]}...")
-            logger.info(f"   Sample: {len(pd.read_csv(file))} total rows")
+            logger.info(f"   Columns ({len(columns)}): {columns[:5]}...")
+            logger.info(f"   Sample: {row_count} total rows")
         
         logger.info(f"\n📊 Ready for Snowflake loading!")
         logger.info(f"🚀 Next: Run 'scripts/run_full_setup.sh' to load into Snowflake")
         
-        return generated_files
+        return [file for file, _, _ in generated_files]
         
     except Exception as e:
         logger.error(f"Processing failed: {e}")
@@ -3,11 +3,20 @@ import snowflake.connector
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 from datetime import datetime
+import io
 import json
 import pydeck as pdk
 import numpy as np
 
+# Prefer orjson's C parser for the float-heavy geometry payloads; stdlib json is the fallback
+try:
+    import orjson
+    parse_geometry_json = orjson.loads
+except ImportError:
+    parse_geometry_json = json.loads
+
 # App configuration
 st.set_page_config(
     page_title="NZ Flood Zone Analysis",
@@ -15,16 +24,50 @@ st.set_page_config(
     layout="wide"
 )
 
+# Scatter traces switch from SVG to WebGL at this many points; small plots keep crisp SVG
+WEBGL_MIN_POINTS = 1000
+
+def scatter_render_mode(data):
+    return "webgl" if len(data) >= WEBGL_MIN_POINTS else "svg"
+
+# Past this many points even WebGL scatters stall, so the data is rasterized into a count grid instead
+RASTER_MIN_POINTS = 20_000
+RASTER_BINS = (400, 250)
+
+def density_raster(data, x, y, title, labels):
+    # Datashader-style aggregation: count points per cell so the browser gets a fixed-size grid, not every row
+    counts, x_edges, y_edges = np.histogram2d(data[x], data[y], bins=RASTER_BINS)
+    fig = go.Figure(go.Heatmap(
+        z=np.where(counts > 0, counts, np.nan).T,
+        x=(x_edges[:-1] + x_edges[1:]) / 2,
+        y=(y_edges[:-1] + y_edges[1:]) / 2,
+        colorscale='Viridis',
+        colorbar_title='Zones'
+    ))
+    fig.update_layout(title=title, xaxis_title=labels[x], yaxis_title=labels[y])
+    return fig
+
 # Snowflake connection
 @st.cache_resource
 def init_connection():
-    return st.connection('snowflake').session()
+    return st.connection('snowflake')
+
+# Complexity buckets from load_flood_zone_data's CASE expression, simplest first
+COMPLEXITY_LEVELS = ['Simple', 'Moderate', 'Complex', 'Highly Complex', 'No Coordinates']
+COMPLEXITY_COLORS = {
+    'Simple': '#2E8B57',
+    'Moderate': '#FFD700',
+    'Complex': '#FF8C00',
+    'Highly Complex': '#DC143C',
+    'No Coordinates': '#808080'
+}
 
 # Data loading with caching
-@st.cache_data(ttl=600)  # Cache for 10 minutes
+@st.cache_data(ttl=600, max_entries=4)  # Cache for 10 minutes
 def load_flood_zone_data():
     query = """
     SELECT 
+        f.fid,
         f.reference,
         f.comments,
         b.geometry_type,
@@ -46,24 +89,113 @@ def load_flood_zone_data():
     JOIN nz_partner_hackathon.WAIPUNA_RANGI.waipa_flood_boundaries b ON f.fid = b.fid
     ORDER BY b.coordinate_count DESC
     """
-    session = init_connection()
-    return session.sql(query).to_pandas()
+    # Fetch through the connector's Arrow result batches straight into pandas
+    with init_connection().cursor() as cursor:
+        cursor.execute(query)
+        flood_data = cursor.fetch_pandas_all()
+    
+    # References repeat across zones, so key rows by the zone's FID for direct lookups
+    flood_data = flood_data.set_index('FID')
+    
+    # Only the zone map reads the boundary JSON, so split it off the working frame into an FID lookup
+    zone_geometries = flood_data.pop('GEOMETRY_JSON').to_dict()
+    
+    # Level filters and group-bys then compare small integer codes instead of strings
+    flood_data['COMPLEXITY_LEVEL'] = pd.Categorical(flood_data['COMPLEXITY_LEVEL'], categories=COMPLEXITY_LEVELS, ordered=True)
+    
+    # Overview figures come from the same rows, so no second query is needed
+    summary_stats = {}
+    if not flood_data.empty:
+        summary_stats = {
+            'total_zones': len(flood_data),
+            'total_area_km2': round(flood_data['SHAPE_AREA_SQM'].sum() / 1_000_000, 3),
+            'avg_area_sqm': round(flood_data['SHAPE_AREA_SQM'].mean(), 0),
+            'max_coordinates': int(flood_data['COORDINATE_COUNT'].max()),
+            'avg_coordinates': round(flood_data['COORDINATE_COUNT'].mean(), 1)
+        }
+    return flood_data, summary_stats, summarize_complexity_levels(flood_data), zone_geometries
 
-@st.cache_data(ttl=600)
-def load_summary_stats():
-    query = """
-    SELECT 
-        COUNT(*) as total_zones,
-        ROUND(SUM(f.shape_area_sqm) / 1000000, 3) as total_area_km2,
-        ROUND(AVG(f.shape_area_sqm), 0) as avg_area_sqm,
-        MAX(b.coordinate_count) as max_coordinates,
-        ROUND(AVG(b.coordinate_count), 1) as avg_coordinates
-    FROM nz_partner_hackathon.WAIPUNA_RANGI.waipa_flood_zones f
-    JOIN nz_partner_hackathon.WAIPUNA_RANGI.waipa_flood_boundaries b ON f.fid = b.fid
-    """
+def summarize_complexity_levels(flood_data):
+    # Per-level aggregates shared by the analysis and export tabs, computed once per data load
+    complexity_stats = flood_data.groupby('COMPLEXITY_LEVEL', observed=True).agg({
+        'SHAPE_AREA_SQM': ['count', 'mean', 'sum'],
+        'COORDINATE_COUNT': 'mean',
+        'AREA_PER_COORDINATE': 'mean'
+    }).round(2)
     
-    session = init_connection()
-    return session.sql(query).to_pandas()
+    # Coordinate-count histogram, binned here so the chart ships bin totals rather than every zone
+    coordinate_counts = flood_data['COORDINATE_COUNT']
+    bin_edges = np.histogram_bin_edges(coordinate_counts, bins='auto')
+    bins = pd.cut(coordinate_counts, bin_edges, include_lowest=True)
+    bin_counts = (
+        flood_data.groupby(['COMPLEXITY_LEVEL', bins], observed=True).size()
+        .unstack(fill_value=0)
+        .reindex(columns=bins.cat.categories, fill_value=0)
+    )
+    
+    return {
+        'coordinate_bin_edges': bin_edges,
+        'coordinate_bin_counts': bin_counts,
+        'coordinate_quartiles': flood_data.groupby('COMPLEXITY_LEVEL', observed=True)['COORDINATE_COUNT'].quantile([0, 0.25, 0.5, 0.75, 1]).unstack(),
+        'complexity_dist': flood_data['COMPLEXITY_LEVEL'].value_counts()[lambda counts: counts > 0],
+        'complexity_stats': complexity_stats,
+        # The export lists area sum before mean
+        'summary_export': complexity_stats[[
+            ('SHAPE_AREA_SQM', 'count'),
+            ('SHAPE_AREA_SQM', 'sum'),
+            ('SHAPE_AREA_SQM', 'mean'),
+            ('COORDINATE_COUNT', 'mean'),
+            ('AREA_PER_COORDINATE', 'mean')
+        ]]
+    }
+
+# Boundary vertices closer than this to the simplified outline are dropped (~1 m at Waipa's latitude)
+SIMPLIFY_TOLERANCE_DEG = 1e-5
+
+def simplify_ring(ring, tolerance=SIMPLIFY_TOLERANCE_DEG):
+    # Douglas-Peucker over the ring's vertex array, splitting spans until every dropped vertex is within tolerance
+    points = np.asarray(ring, dtype=np.float64)
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+    spans = [(0, len(points) - 1)]
+    while spans:
+        start, end = spans.pop()
+        if end - start < 2:
+            continue
+        segment = points[end] - points[start]
+        offsets = points[start + 1:end] - points[start]
+        length = np.hypot(segment[0], segment[1])
+        if length > 0:
+            distances = np.abs(segment[0] * offsets[:, 1] - segment[1] * offsets[:, 0]) / length
+        else:
+            # Closed ring: the span starts and ends on the same vertex
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        farthest = int(distances.argmax())
+        if distances[farthest] > tolerance:
+            split = start + 1 + farthest
+            keep[split] = True
+            spans.extend([(start, split), (split, end)])
+    
+    # A valid ring needs at least three distinct vertices plus the closing one
+    if keep.sum() < 4:
+        return ring
+    return np.round(points[keep], 5).tolist()
+
+@st.cache_data(ttl=600, max_entries=64)
+def simplify_zone_ring(zone_fid, geometry_version, _ring):
+    # Keyed on the zone FID and its geometry version; the leading underscore keeps Streamlit from hashing the vertex list
+    return simplify_ring(_ring)
+
+# Rows handed to the CSV writer per chunk when building downloads
+CSV_EXPORT_CHUNK_ROWS = 10_000
+
+@st.cache_data(ttl=600, max_entries=2)
+def to_csv_bytes(df):
+    # Serialized once per distinct export, not on every rerun of the export tab;
+    # rows are encoded straight into the buffer in chunks, so no full-size str is built first
+    buffer = io.BytesIO()
+    df.to_csv(buffer, index=False, chunksize=CSV_EXPORT_CHUNK_ROWS)
+    return buffer.getvalue()
 
 def main():
     st.title("🌊 Waipa Flood Zone Complexity Analysis")
@@ -71,8 +203,7 @@ def main():
     
     # Load data
     with st.spinner("Loading flood zone data..."):
-        flood_data = load_flood_zone_data()
-        summary_stats = load_summary_stats()
+        flood_data, summary_stats, complexity_summary, zone_geometries = load_flood_zone_data()
     
     if flood_data.empty:
         st.error("No flood zone data available")
@@ -83,36 +214,40 @@ def main():
     col1, col2, col3, col4, col5 = st.columns(5)
     
     with col1:
-        st.metric("Total Zones", f"{summary_stats.iloc[0]['TOTAL_ZONES']:,}")
+        st.metric("Total Zones", f"{summary_stats['total_zones']:,}")
     with col2:
-        st.metric("Total Area", f"{summary_stats.iloc[0]['TOTAL_AREA_KM2']:.1f} km²")
+        st.metric("Total Area", f"{summary_stats['total_area_km2']:.1f} km²")
     with col3:
-        st.metric("Avg Zone Size", f"{summary_stats.iloc[0]['AVG_AREA_SQM']:,.0f} m²")
+        st.metric("Avg Zone Size", f"{summary_stats['avg_area_sqm']:,.0f} m²")
     with col4:
-        st.metric("Max Coordinates", f"{summary_stats.iloc[0]['MAX_COORDINATES']:,}")
+        st.metric("Max Coordinates", f"{summary_stats['max_coordinates']:,}")
     with col5:
-        st.metric("Avg Coordinates", f"{summary_stats.iloc[0]['AVG_COORDINATES']:.1f}")
+        st.metric("Avg Coordinates", f"{summary_stats['avg_coordinates']:.1f}")
     
-    # Main analysis sections
-    tab1, tab2, tab3, tab4 = st.tabs(["🔍 Complexity Analysis", "📈 Visualizations", "🗺️ Zone Details", "📊 Data Export"])
-    
-    with tab1:
-        complexity_analysis(flood_data)
-    
-    with tab2:
-        create_visualizations(flood_data)
-    
-    with tab3:
-        zone_details(flood_data)
+    # Main analysis sections; st.tabs would run every section on each rerun, so only the
+    # selected one is rendered (the geometry parse and pydeck map run only on Zone Details)
+    active_tab = st.radio(
+        "Section",
+        ["🔍 Complexity Analysis", "📈 Visualizations", "🗺️ Zone Details", "📊 Data Export"],
+        horizontal=True,
+        label_visibility="collapsed",
+        key="active_tab"
+    )
     
-    with tab4:
-        data_export(flood_data)
+    if active_tab == "🔍 Complexity Analysis":
+        complexity_analysis(flood_data, complexity_summary)
+    elif active_tab == "📈 Visualizations":
+        create_visualizations(flood_data, complexity_summary)
+    elif active_tab == "🗺️ Zone Details":
+        zone_details(flood_data, zone_geometries)
+    else:
+        data_export(flood_data, complexity_summary, zone_geometries)
 
-def complexity_analysis(flood_data):
+def complexity_analysis(flood_data, complexity_summary):
     st.subheader("Geometric Complexity Distribution")
     
     # Complexity level distribution
-    complexity_dist = flood_data['COMPLEXITY_LEVEL'].value_counts()
+    complexity_dist = complexity_summary['complexity_dist']
     
     col1, col2 = st.columns(2)
     
@@ -122,49 +257,43 @@ def complexity_analysis(flood_data):
             values=complexity_dist.values,
             names=complexity_dist.index,
             title="Distribution by Complexity Level",
-            color_discrete_map={
-                'Simple': '#2E8B57',
-                'Moderate': '#FFD700', 
-                'Complex': '#FF8C00',
-                'Highly Complex': '#DC143C',
-                'No Coordinates': '#808080'
-            }
+            color_discrete_map=COMPLEXITY_COLORS
         )
         st.plotly_chart(fig_pie, use_container_width=True)
     
     with col2:
         # Statistics by complexity level
-        complexity_stats = flood_data.groupby('COMPLEXITY_LEVEL').agg({
-            'SHAPE_AREA_SQM': ['count', 'mean', 'sum'],
-            'COORDINATE_COUNT': 'mean',
-            'AREA_PER_COORDINATE': 'mean'
-        }).round(2)
-        
         st.write("**Statistics by Complexity Level:**")
-        st.dataframe(complexity_stats, use_container_width=True)
+        st.dataframe(complexity_summary['complexity_stats'], use_container_width=True)
     
     # Filter controls
     st.subheader("🔍 Filter Analysis")
     
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        selected_complexity = st.multiselect(
-            "Select Complexity Levels",
-            options=flood_data['COMPLEXITY_LEVEL'].unique(),
-            default=flood_data['COMPLEXITY_LEVEL'].unique()
-        )
-    with col2:
-        min_area = st.number_input(
-            "Minimum Area (m²)",
-            value=0,
-            max_value=int(flood_data['SHAPE_AREA_SQM'].max())
-        )
-    with col3:
-        min_coordinates = st.number_input(
-            "Minimum Coordinates",
-            value=0,
-            max_value=int(flood_data['COORDINATE_COUNT'].max())
-        )
+    # Levels present in the data, in complexity order
+    present_levels = flood_data['COMPLEXITY_LEVEL'].cat.remove_unused_categories().cat.categories.tolist()
+    
+    # Batch the inputs in a form so edits only rerun the app once Apply is pressed
+    with st.form("zone_filters"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            selected_complexity = st.multiselect(
+                "Select Complexity Levels",
+                options=present_levels,
+                default=present_levels
+            )
+        with col2:
+            min_area = st.number_input(
+                "Minimum Area (m²)",
+                value=0,
+                max_value=int(flood_data['SHAPE_AREA_SQM'].max())
+            )
+        with col3:
+            min_coordinates = st.number_input(
+                "Minimum Coordinates",
+                value=0,
+                max_value=int(flood_data['COORDINATE_COUNT'].max())
+            )
+        st.form_submit_button("Apply Filters")
     
     # Apply filters
     filtered_data = flood_data[
@@ -176,7 +305,36 @@ def complexity_analysis(flood_data):
     st.write(f"**Filtered Results: {len(filtered_data)} zones**")
     st.dataframe(filtered_data[['REFERENCE', 'COMPLEXITY_LEVEL', 'COORDINATE_COUNT', 'SHAPE_AREA_SQM', 'AREA_PER_COORDINATE']].head(20))
 
-def create_visualizations(flood_data):
+def coordinate_histogram(complexity_summary):
+    # Stacked bars from the pre-binned counts, with a box marginal drawn from precomputed quartiles
+    bin_edges = complexity_summary['coordinate_bin_edges']
+    bin_centres = (bin_edges[:-1] + bin_edges[1:]) / 2
+    bin_widths = np.diff(bin_edges)
+    
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.2, 0.8], vertical_spacing=0.02)
+    for level, counts in complexity_summary['coordinate_bin_counts'].iterrows():
+        color = COMPLEXITY_COLORS.get(level)
+        quartiles = complexity_summary['coordinate_quartiles'].loc[level]
+        fig.add_trace(
+            go.Box(
+                y=[level], orientation='h', name=level, legendgroup=level, showlegend=False, marker_color=color,
+                lowerfence=[quartiles[0.0]], q1=[quartiles[0.25]], median=[quartiles[0.5]],
+                q3=[quartiles[0.75]], upperfence=[quartiles[1.0]]
+            ),
+            row=1, col=1
+        )
+        fig.add_trace(
+            go.Bar(x=bin_centres, y=counts.to_numpy(), width=bin_widths, name=level, legendgroup=level, marker_color=color),
+            row=2, col=1
+        )
+    
+    fig.update_layout(title="Distribution of Coordinate Counts", barmode='stack', bargap=0, legend_title_text='COMPLEXITY_LEVEL')
+    fig.update_yaxes(showticklabels=False, row=1, col=1)
+    fig.update_xaxes(title_text='Number of Coordinates', row=2, col=1)
+    fig.update_yaxes(title_text='count', row=2, col=1)
+    return fig
+
+def create_visualizations(flood_data, complexity_summary):
     st.subheader("📈 Interactive Visualizations")
     
     # Scatter plot: Area vs Coordinates
@@ -186,8 +344,20 @@ def create_visualizations(flood_data):
         # Filter out zones with NaN area_per_coordinate for the size parameter
         scatter_data = flood_data.dropna(subset=['AREA_PER_COORDINATE']).copy()
         
+        # Too many zones to draw individually: show point density instead
+        if len(scatter_data) > RASTER_MIN_POINTS:
+            fig_scatter = density_raster(
+                scatter_data,
+                'COORDINATE_COUNT',
+                'SHAPE_AREA_SQM',
+                title="Zone Area vs Coordinate Count (Point Density)",
+                labels={
+                    'COORDINATE_COUNT': 'Number of Coordinates',
+                    'SHAPE_AREA_SQM': 'Area (m²)'
+                }
+            )
         # If we have valid data for sizing
-        if not scatter_data.empty:
+        elif not scatter_data.empty:
             fig_scatter = px.scatter(
                 scatter_data,
                 x='COORDINATE_COUNT',
@@ -195,19 +365,14 @@ def create_visualizations(flood_data):
                 color='COMPLEXITY_LEVEL',
                 size='AREA_PER_COORDINATE',
                 hover_data=['REFERENCE', 'COMMENTS'],
+                render_mode=scatter_render_mode(scatter_data),
                 title="Zone Area vs Coordinate Count (with Efficiency Sizing)",
                 labels={
                     'COORDINATE_COUNT': 'Number of Coordinates',
                     'SHAPE_AREA_SQM': 'Area (m²)',
                     'COMPLEXITY_LEVEL': 'Complexity'
                 },
-                color_discrete_map={
-                    'Simple': '#2E8B57',
-                    'Moderate': '#FFD700', 
-                    'Complex': '#FF8C00',
-                    'Highly Complex': '#DC143C',
-                    'No Coordinates': '#808080'
-                }
+                color_discrete_map=COMPLEXITY_COLORS
             )
         else:
             # Fallback: use area for sizing instead
@@ -218,19 +383,14 @@ def create_visualizations(flood_data):
                 color='COMPLEXITY_LEVEL',
                 size='SHAPE_AREA_SQM',
                 hover_data=['REFERENCE', 'COMMENTS'],
+                render_mode=scatter_render_mode(flood_data),
                 title="Zone Area vs Coordinate Count",
                 labels={
                     'COORDINATE_COUNT': 'Number of Coordinates',
                     'SHAPE_AREA_SQM': 'Area (m²)',
                     'COMPLEXITY_LEVEL': 'Complexity'
                 },
-                color_discrete_map={
-                    'Simple': '#2E8B57',
-                    'Moderate': '#FFD700', 
-                    'Complex': '#FF8C00',
-                    'Highly Complex': '#DC143C',
-                    'No Coordinates': '#808080'
-                }
+                color_discrete_map=COMPLEXITY_COLORS
             )
         
         fig_scatter.update_layout(height=500)
@@ -243,21 +403,7 @@ def create_visualizations(flood_data):
     
     with col2:
         # Histogram of coordinate counts
-        fig_hist = px.histogram(
-            flood_data,
-            x='COORDINATE_COUNT',
-            color='COMPLEXITY_LEVEL',
-            title="Distribution of Coordinate Counts",
-            labels={'COORDINATE_COUNT': 'Number of Coordinates'},
-            marginal="box",
-            color_discrete_map={
-                'Simple': '#2E8B57',
-                'Moderate': '#FFD700', 
-                'Complex': '#FF8C00',
-                'Highly Complex': '#DC143C',
-                'No Coordinates': '#808080'
-            }
-        )
+        fig_hist = coordinate_histogram(complexity_summary)
         fig_hist.update_layout(height=500)
         st.plotly_chart(fig_hist, use_container_width=True)
     
@@ -289,31 +435,25 @@ def create_visualizations(flood_data):
             color='COMPLEXITY_LEVEL',
             size='SHAPE_AREA_SQM',
             hover_data=['REFERENCE'],
+            render_mode=scatter_render_mode(efficiency_data),
             title="Geometric Efficiency: Area per Coordinate",
             labels={
                 'COORDINATE_COUNT': 'Number of Coordinates',
                 'AREA_PER_COORDINATE': 'Area per Coordinate (m²/coord)',
                 'COMPLEXITY_LEVEL': 'Complexity'
             },
-            color_discrete_map={
-                'Simple': '#2E8B57',
-                'Moderate': '#FFD700', 
-                'Complex': '#FF8C00',
-                'Highly Complex': '#DC143C'
-            }
+            color_discrete_map=COMPLEXITY_COLORS
         )
         
-        # Add trend line
+        # Add trend line, fitted directly with least squares rather than via a second plotly figure
         try:
-            trend_fig = px.scatter(
-                efficiency_data, 
-                x='COORDINATE_COUNT', 
-                y='AREA_PER_COORDINATE', 
-                trendline="ols"
-            )
-            if len(trend_fig.data) > 1:
-                fig_efficiency.add_traces(
-                    trend_fig.data[1].update(name="Trend", line_color="red")
+            x = efficiency_data['COORDINATE_COUNT'].to_numpy(dtype=np.float64)
+            y = efficiency_data['AREA_PER_COORDINATE'].to_numpy(dtype=np.float64)
+            if len(x) > 1 and x.min() < x.max():
+                slope, intercept = np.polyfit(x, y, 1)
+                trend_x = np.array([x.min(), x.max()])
+                fig_efficiency.add_trace(
+                    go.Scatter(x=trend_x, y=slope * trend_x + intercept, mode='lines', name="Trend", line_color="red")
                 )
         except Exception as e:
             st.caption(f"⚠️ Could not add trend line: {str(e)}")
@@ -339,18 +479,22 @@ def create_visualizations(flood_data):
     else:
         st.warning("No zones have coordinate data for efficiency analysis.")
 
-def zone_details(flood_data):
+def zone_details(flood_data, zone_geometries):
     st.subheader("🗺️ Individual Zone Analysis")
     
-    # Zone selector
+    # Zone selector over FIDs, so zones sharing a reference can each be picked,
+    # labelled from FID -> reference/complexity lookups built once per render
+    zone_references = flood_data['REFERENCE'].to_dict()
+    zone_complexity = flood_data['COMPLEXITY_LEVEL'].to_dict()
     selected_zone = st.selectbox(
         "Select a flood zone for detailed analysis:",
-        options=flood_data['REFERENCE'].tolist(),
-        format_func=lambda x: f"{x} ({flood_data[flood_data['REFERENCE']==x]['COMPLEXITY_LEVEL'].iloc[0]})"
+        options=flood_data.index.tolist(),
+        format_func=lambda x: f"{zone_references[x]} #{x} ({zone_complexity[x]})"
     )
     
-    if selected_zone:
-        zone_info = flood_data[flood_data['REFERENCE'] == selected_zone].iloc[0]
+    if selected_zone is not None:
+        zone_info = flood_data.loc[selected_zone]
+        geometry_json = zone_geometries.get(selected_zone)
         
         col1, col2 = st.columns(2)
         
@@ -376,10 +520,10 @@ def zone_details(flood_data):
         # Map visualization
         st.subheader("🗺️ Zone Boundary Map")
         
-        if pd.notna(zone_info['GEOMETRY_JSON']) and zone_info['COORDINATE_COUNT'] > 0:
+        if pd.notna(geometry_json) and zone_info['COORDINATE_COUNT'] > 0:
             try:
                 # Parse the geometry JSON
-                geometry_data = json.loads(zone_info['GEOMETRY_JSON'])
+                geometry_data = parse_geometry_json(geometry_json)
                 
                 # Default to Waipa District center coordinates
                 center_lat, center_lon = -38.0, 175.3
@@ -393,45 +537,50 @@ def zone_details(flood_data):
                         if geometry_data.get('type') == 'Polygon':
                             ring = coords[0] if coords[0] else []
                             if ring and len(ring) > 2:
-                                polygon_coords = [[coord[0], coord[1]] for coord in ring if len(coord) >= 2]
-                                if polygon_coords:
-                                    # Calculate center
-                                    lons = [coord[0] for coord in polygon_coords]
-                                    lats = [coord[1] for coord in polygon_coords]
-                                    center_lon = sum(lons) / len(lons)
-                                    center_lat = sum(lats) / len(lats)
+                                # One array copy of the ring, keeping lon/lat and dropping any extra ordinates
+                                vertices = np.asarray(ring, dtype=np.float64)[:, :2]
+                                polygon_coords = vertices.tolist()
+                                # Calculate center as the mean vertex
+                                center_lon, center_lat = vertices.mean(axis=0)
                         
                         # Handle MultiPolygon type (use first polygon)
                         elif geometry_data.get('type') == 'MultiPolygon':
                             if coords[0] and len(coords[0]) > 0:
                                 ring = coords[0][0] if coords[0][0] else []
                                 if ring and len(ring) > 2:
-                                    polygon_coords = [[coord[0], coord[1]] for coord in ring if len(coord) >= 2]
-                                    if polygon_coords:
-                                        lons = [coord[0] for coord in polygon_coords]
-                                        lats = [coord[1] for coord in polygon_coords]
-                                        center_lon = sum(lons) / len(lons)
-                                        center_lat = sum(lats) / len(lats)
+                                    vertices = np.asarray(ring, dtype=np.float64)[:, :2]
+                                    polygon_coords = vertices.tolist()
+                                    center_lon, center_lat = vertices.mean(axis=0)
                 
                 if polygon_coords:
-                    # Create polygon data for pydeck
-                    polygon_data = pd.DataFrame([{
-                        'coordinates': [polygon_coords],
-                        'zone_ref': zone_info['REFERENCE'],
-                        'area': zone_info['SHAPE_AREA_SQM'],
-                        'complexity': zone_info['COMPLEXITY_LEVEL']
-                    }])
-                    
-                    # Create center point data
-                    center_data = pd.DataFrame([{
-                        'lat': center_lat,
-                        'lon': center_lon,
-                        'zone_ref': zone_info['REFERENCE']
-                    }])
-                    
-                    # Create the pydeck chart
-                    st.pydeck_chart(
-                        pdk.Deck(
+                    # Build this zone's Deck once and reuse it on later reruns, so the map component
+                    # receives the identical layer spec instead of a freshly rebuilt vertex buffer;
+                    # the key carries a version of the zone's loaded data so a reload rebuilds it,
+                    # and only the current zone's Deck is kept
+                    geometry_version = hash((geometry_json, zone_info['REFERENCE'], zone_info['SHAPE_AREA_SQM'], zone_info['COMPLEXITY_LEVEL']))
+                    deck_key = (selected_zone, geometry_version)
+                    cached_deck = st.session_state.get('zone_deck')
+                    if cached_deck is None or cached_deck[0] != deck_key:
+                        # Hand pydeck the simplified outline; it is indistinguishable at the map's zoom
+                        polygon_coords = simplify_zone_ring(selected_zone, geometry_version, polygon_coords)
+                        
+                        # Create polygon data for pydeck
+                        polygon_data = pd.DataFrame([{
+                            'coordinates': [polygon_coords],
+                            'zone_ref': zone_info['REFERENCE'],
+                            'area': zone_info['SHAPE_AREA_SQM'],
+                            'complexity': zone_info['COMPLEXITY_LEVEL']
+                        }])
+                        
+                        # Create center point data
+                        center_data = pd.DataFrame([{
+                            'lat': center_lat,
+                            'lon': center_lon,
+                            'zone_ref': zone_info['REFERENCE']
+                        }])
+                        
+                        # Create the pydeck chart
+                        zone_deck = pdk.Deck(
                             map_style=None,  # Use Streamlit theme
                             initial_view_state=pdk.ViewState(
                                 latitude=center_lat,
@@ -463,9 +612,10 @@ def zone_details(flood_data):
                                 'html': '<b>Flood Zone: {zone_ref}</b><br/>Area: {area:,} m²<br/>Complexity: {complexity}',
                                 'style': {'backgroundColor': 'steelblue', 'color': 'white'}
                             }
-                        ),
-                        height=500
-                    )
+                        )
+                        st.session_state['zone_deck'] = (deck_key, zone_deck)
+                    
+                    st.pydeck_chart(st.session_state['zone_deck'][1], height=500)
                     
                     # Show zone summary below map
                     st.info(f"📍 **{zone_info['REFERENCE']}** - {zone_info['COMPLEXITY_LEVEL']} flood zone covering {zone_info['SHAPE_AREA_SQM']:,.0f} m²")
@@ -479,16 +629,16 @@ def zone_details(flood_data):
             except Exception as e:
                 st.error(f"Error creating map visualization: {str(e)}")
                 st.write("**Debug info:**")
-                st.code(zone_info['GEOMETRY_JSON'][:200] + "..." if len(zone_info['GEOMETRY_JSON']) > 200 else zone_info['GEOMETRY_JSON'])
+                st.code(geometry_json[:200] + "..." if len(geometry_json) > 200 else geometry_json)
         else:
             st.warning("No geometry data available for this zone")
         
         # Expandable section for raw geometry data
-        if pd.notna(zone_info['GEOMETRY_JSON']):
+        if pd.notna(geometry_json):
             with st.expander("View Raw Geometry Data"):
-                st.json(zone_info['GEOMETRY_JSON'])
+                st.json(geometry_json)
 
-def data_export(flood_data):
+def data_export(flood_data, complexity_summary, zone_geometries):
     st.subheader("📊 Data Export & Insights")
     
     # Export options
@@ -497,8 +647,14 @@ def data_export(flood_data):
     with col1:
         st.write("**Export Options:**")
         
-        # Full dataset
-        csv_full = flood_data.to_csv(index=False)
+        # Full dataset; the boundary JSON dwarfs every other column, so it is opt-in
+        include_geometry = st.checkbox("Include boundary geometry (GEOMETRY_JSON)", value=False)
+        export_data = flood_data
+        if include_geometry:
+            # Put the column back where the query selected it, between the area and efficiency fields
+            export_data = flood_data.copy()
+            export_data.insert(export_data.columns.get_loc('SHAPE_AREA_SQM') + 1, 'GEOMETRY_JSON', pd.Series(zone_geometries))
+        csv_full = to_csv_bytes(export_data)
         st.download_button(
             label="📄 Download Full Dataset (CSV)",
             data=csv_full,
@@ -507,13 +663,7 @@ def data_export(flood_data):
         )
         
         # Summary by complexity
-        summary_export = flood_data.groupby('COMPLEXITY_LEVEL').agg({
-            'SHAPE_AREA_SQM': ['count', 'sum', 'mean'],
-            'COORDINATE_COUNT': 'mean',
-            'AREA_PER_COORDINATE': 'mean'
-        }).round(2)
-        
-        csv_summary = summary_export.to_csv()
+        csv_summary = complexity_summary['summary_export'].to_csv()
         st.download_button(
             label="📊 Download Summary Stats (CSV)",
             data=csv_summary,